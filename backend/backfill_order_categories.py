@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from db import orders_collection, products_collection, categories_collection
+
+
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "500"))
+
+MISSING_SNAPSHOT = {"items": {"$elemMatch": {"category_id": {"$exists": False}}}}
+
+
+async def load_snapshots(product_ids):
+    products = await products_collection.find(
+        {"_id": {"$in": list(product_ids)}},
+        {"category_id": 1},
+    ).to_list(length=None)
+    category_ids = {ObjectId(p["category_id"]) for p in products if p.get("category_id")}
+
+    categories = await categories_collection.find(
+        {"_id": {"$in": list(category_ids)}},
+        {"name": 1},
+    ).to_list(length=None)
+    names = {c["_id"]: c["name"] for c in categories}
+
+    snapshots = {}
+    for p in products:
+        category_id = ObjectId(p["category_id"]) if p.get("category_id") else None
+        snapshots[p["_id"]] = (category_id, names.get(category_id))
+    return snapshots
+
+
+def build_update(order, snapshots):
+    set_ops = {}
+    array_filters = []
+
+    product_ids = {ObjectId(item["product_id"]) for item in order.get("items", []) if "category_id" not in item}
+    for i, product_id in enumerate(product_ids):
+        category_id, category_name = snapshots.get(product_id, (None, None))
+        set_ops[f"items.$[p{i}].category_id"] = category_id
+        set_ops[f"items.$[p{i}].category_name"] = category_name
+        array_filters.append({
+            f"p{i}.product_id": {"$in": [product_id, str(product_id)]},
+            f"p{i}.category_id": {"$exists": False},
+        })
+
+    return UpdateOne({"_id": order["_id"]}, {"$set": set_ops}, array_filters=array_filters)
+
+
+async def main():
+    last_id = None
+    updated = 0
+
+    while True:
+        query = dict(MISSING_SNAPSHOT)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        orders = await orders_collection.find(query, {"items": 1}).sort("_id", 1).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not orders:
+            break
+
+        product_ids = {
+            ObjectId(item["product_id"])
+            for order in orders
+            for item in order.get("items", [])
+            if "category_id" not in item
+        }
+        snapshots = await load_snapshots(product_ids)
+
+        result = await orders_collection.bulk_write(
+            [build_update(order, snapshots) for order in orders],
+            ordered=False,
+        )
+        updated += result.modified_count
+        last_id = orders[-1]["_id"]
+        print(f"Backfilled {updated} orders...")
+
+    print("DONE")
+    print(f"orders updated: {updated}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+"""Compare access-token validation paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.jwt_decode [iterations]
+
+Measures python-jose (current decode_token), PyJWT, and a hit in the
+verified-token LRU used by get_access_payload.
+"""
+import hashlib
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import jwt as pyjwt
+from jose import jwt as jose_jwt
+
+from utils.lru import TTLCache
+
+
+SECRET = "benchmark-secret"
+ALGORITHM = "HS256"
+
+
+def make_token() -> str:
+    payload = {
+        "sub": "65a1f0c2e4b0a1b2c3d4e5f6",
+        "role": "customer",
+        "exp": datetime.utcnow() + timedelta(hours=1),
+    }
+    return jose_jwt.encode(payload, SECRET, algorithm=ALGORITHM)
+
+
+def main(iterations: int = 20000):
+    token = make_token()
+    cache = TTLCache(maxsize=10000, ttl=3600)
+    cache.set(hashlib.sha256(token.encode()).digest(), jose_jwt.decode(token, SECRET, algorithms=[ALGORITHM]))
+
+    cases = {
+        "python-jose decode": lambda: jose_jwt.decode(token, SECRET, algorithms=[ALGORITHM]),
+        "PyJWT decode": lambda: pyjwt.decode(token, SECRET, algorithms=[ALGORITHM]),
+        "LRU hit (sha256 + lookup)": lambda: cache.get(hashlib.sha256(token.encode()).digest()),
+    }
+
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(f"{name:<28} {seconds / iterations * 1e6:8.2f} us/op")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,71 @@
+"""Compare response serialization paths for a 100-item product page.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization [iterations]
+
+Measures what FastAPI does for a response_model (validate, dump in JSON
+mode, stdlib json.dumps) against fast_response's field shaping + orjson.
+"""
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from models.product import ProductResponse
+from utils.serialization import dumps, shape_documents
+
+
+PAGE_SIZE = 100
+
+
+def make_page() -> list[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Product {i}",
+            "description": "Lorem ipsum dolor sit amet " * 4,
+            "image_url": f"https://example.com/img/{i}.jpg",
+            "price": 19.99 + i,
+            "category_id": ObjectId(),
+            "variants": [
+                {"size": size, "color": color, "stock": 10}
+                for size in ("S", "M", "L")
+                for color in ("black", "white")
+            ],
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(PAGE_SIZE)
+    ]
+
+
+def main(iterations: int = 200):
+    page = make_page()
+    model = list[ProductResponse]
+    adapter = TypeAdapter(model)
+
+    def pydantic_path():
+        content = adapter.dump_python(adapter.validate_python(page), mode="json", by_alias=True)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def fast_path():
+        return dumps(shape_documents(model, page))
+
+    assert json.loads(pydantic_path()) == json.loads(fast_path())
+
+    cases = {
+        "pydantic + json.dumps": pydantic_path,
+        "shape + orjson": fast_path,
+    }
+
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(f"{name:<24} {seconds / iterations * 1e3:8.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -4,6 +4,11 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     MONGO_URL: str
     DB_NAME: str
+    MONGO_TRANSACTIONS: bool = True
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int | None = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int | None = None
 
     JWT_SECRET_KEY: str
     ALGORITHM: str
@@ -12,8 +17,52 @@ class Settings(BaseSettings):
     JWT_ACCESS_TOKEN_EXPIRE_SECONDS: int
     JWT_REFRESH_TOKEN_EXPIRE_SECONDS: int
     COOKIE_SECURE: bool
+    JWT_DECODE_CACHE_SIZE: int = 10000
     
     REDIS_URL_DOCKER: str
+    REDIS_MAX_CONNECTIONS: int | None = None
+    REDIS_SOCKET_TIMEOUT: float | None = None
+    REDIS_SOCKET_CONNECT_TIMEOUT: float | None = None
+
+    PRODUCT_CACHE_TTL: int = 300
+    PRODUCT_LIST_CACHE_TTL: int = 60
+    STATS_BUCKET_CACHE_TTL: int = 86400
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_LOCAL_TTL: int = 5
+    USER_CACHE_SIZE: int = 4096
+
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    RESERVATION_TTL_SECONDS: int = 900
+    CHECKOUT_HOLD_TTL_SECONDS: int = 30
+    RESERVATION_SWEEP_INTERVAL_SECONDS: float = 5
+
+    STOCK_COUNTER_SLOTS: int = 8
+    STOCK_COMPACTION_INTERVAL_SECONDS: float = 2
+
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1
+    OUTBOX_LEASE_SECONDS: int = 30
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETENTION_SECONDS: int = 86400
+
+    # Requests per minute per token bucket; a bucket also allows bursts of that size.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN_PER_IP: int = 20
+    RATE_LIMIT_LOGIN_PER_IP_ACCOUNT: int = 5
+    RATE_LIMIT_PRODUCTS_PER_IP: int = 600
+    RATE_LIMIT_PRODUCTS_PER_USER: int = 600
+    RATE_LIMIT_STATS_PER_IP: int = 60
+    RATE_LIMIT_STATS_PER_USER: int = 30
+    RATE_LIMIT_LOCAL_CACHE_SIZE: int = 10000
+    # Comma-separated proxy addresses or CIDRs whose X-Forwarded-For is trusted.
+    RATE_LIMIT_TRUSTED_PROXIES: str = ""
+
+    METRICS_TOKEN: str | None = None
+
+    INDEX_REPORT_ON_STARTUP: bool = True
+    FAST_JSON_RESPONSES: bool = True
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
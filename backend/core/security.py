@@ -1,3 +1,6 @@
+import hashlib
+import time
+
 from jose import jwt
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta
@@ -32,5 +35,18 @@ def decode_token(token: str):
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
\ No newline at end of file
+    except jwt.JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+
+def token_ttl(payload: dict) -> float | None:
+    exp = payload.get("exp")
+    if exp is None:
+        return None
+    return exp - time.time()
\ No newline at end of file
@@ -1,10 +1,34 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from core.config import settings
+from utils.mongo_monitoring import CommandMetricsListener, PoolMetricsListener
 
-client = AsyncIOMotorClient(settings.MONGO_URL)
+client = AsyncIOMotorClient(
+    settings.MONGO_URL,
+    maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+    minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    event_listeners=[CommandMetricsListener(), PoolMetricsListener()],
+)
 db = client[settings.DB_NAME]
 
 users_collection = db.users
 products_collection = db.products
 categories_collection = db.categories
 orders_collection = db.orders
+product_prefixes_collection = db.product_prefixes
+stock_counters_collection = db.stock_counters
+order_events_collection = db.order_events
+
+sales_daily_collection = db.sales_daily
+sales_category_daily_collection = db.sales_category_daily
+sales_product_daily_collection = db.sales_product_daily
+
+
+async def check_transactions():
+    # Transactions need a replica set or a sharded cluster (mongos).
+    hello = await client.admin.command("hello")
+    if not hello.get("setName") and hello.get("msg") != "isdbgrid":
+        raise RuntimeError(
+            "MONGO_TRANSACTIONS is enabled but MONGO_URL does not point to a replica set or sharded cluster"
+        )
@@ -1,3 +1,4 @@
+import hmac
 from typing import Annotated
 
 from fastapi import Depends, Request, HTTPException, status
@@ -6,19 +7,26 @@ from pydantic import BaseModel
 
 
 
-from core.security import decode_token  
+from core.security import decode_token, token_digest, token_ttl
 from core.config import settings   
+from utils.lru import TTLCache
+from utils.rate_limit import client_ip, enforce_rate_limit
+from utils.redis import record_cache_lookup
 
 from repositories.product_repo import ProductRepository
 from repositories.category_repo import CategoryRepository
 from repositories.user_repo import UserRepository
 from repositories.order_repo import OrderRepository
+from repositories.stats_repo import StatsRepository
+from repositories.stock_counter_repo import StockCounterRepository
 
 from services.product_service import ProductService
 from services.category_service import CategoryService
 from services.user_service import UserService
 from services.order_service import OrderService
 from services.auth_service import AuthService
+from services.stats_service import StatsService
+from services.reservation_service import ReservationService
 
 from models.user import UserResponse, UserRole
 
@@ -31,6 +39,12 @@ class TokenPayload(BaseModel):
     exp: int | None = None
 
 
+verified_access_tokens = TTLCache(
+    maxsize=settings.JWT_DECODE_CACHE_SIZE,
+    ttl=settings.JWT_ACCESS_TOKEN_EXPIRE_SECONDS,
+)
+
+
 # Repository Getters
 
 async def get_product_repo() -> ProductRepository:
@@ -48,12 +62,22 @@ async def get_user_repo() -> UserRepository:
 async def get_order_repo() -> OrderRepository:
     return OrderRepository()
 
+
+async def get_stats_repo() -> StatsRepository:
+    return StatsRepository()
+
+
+async def get_stock_counter_repo() -> StockCounterRepository:
+    return StockCounterRepository()
+
 # Repository Dependencies
 
 ProductRepositoryDep = Annotated[ProductRepository, Depends(get_product_repo)]
 CategoryRepositoryDep = Annotated[CategoryRepository, Depends(get_category_repo)]
 UserRepositoryDep = Annotated[UserRepository, Depends(get_user_repo)]
 OrderRepositoryDep = Annotated[OrderRepository, Depends(get_order_repo)]
+StatsRepositoryDep = Annotated[StatsRepository, Depends(get_stats_repo)]
+StockCounterRepositoryDep = Annotated[StockCounterRepository, Depends(get_stock_counter_repo)]
 
 
 
@@ -61,9 +85,9 @@ OrderRepositoryDep = Annotated[OrderRepository, Depends(get_order_repo)]
 
 async def get_product_service(
     product_repo: ProductRepositoryDep,
-    category_repo: CategoryRepositoryDep,
+    counter_repo: StockCounterRepositoryDep,
 ) -> ProductService:
-    return ProductService(product_repo, category_repo)
+    return ProductService(product_repo, counter_repo)
 
 
 async def get_category_service(
@@ -78,12 +102,19 @@ async def get_user_service(
     return UserService(user_repo)
 
 
+async def get_reservation_service(
+    product_repo: ProductRepositoryDep,
+    counter_repo: StockCounterRepositoryDep,
+) -> ReservationService:
+    return ReservationService(product_repo, counter_repo)
+
+
 async def get_order_service(
     order_repo: OrderRepositoryDep,
-    product_repo: ProductRepositoryDep,
     user_repo: UserRepositoryDep,
+    reservation_service: Annotated[ReservationService, Depends(get_reservation_service)],
 ) -> OrderService:
-    return OrderService(order_repo, product_repo, user_repo)
+    return OrderService(order_repo, user_repo, reservation_service)
 
 
 async def get_auth_service(
@@ -92,6 +123,12 @@ async def get_auth_service(
     return AuthService(user_repo)
 
 
+async def get_stats_service(
+    stats_repo: StatsRepositoryDep,
+) -> StatsService:
+    return StatsService(stats_repo)
+
+
 # Service Dependencies
 
 ProductServiceDep = Annotated[ProductService, Depends(get_product_service)]
@@ -99,6 +136,8 @@ CategoryServiceDep = Annotated[CategoryService, Depends(get_category_service)]
 UserServiceDep = Annotated[UserService, Depends(get_user_service)]
 OrderServiceDep = Annotated[OrderService, Depends(get_order_service)]
 AuthServiceDep = Annotated[AuthService, Depends(get_auth_service)]
+StatsServiceDep = Annotated[StatsService, Depends(get_stats_service)]
+ReservationServiceDep = Annotated[ReservationService, Depends(get_reservation_service)]
 
 
 
@@ -119,15 +158,26 @@ async def get_access_payload(request: Request) -> TokenPayload:
             detail="Access token missing",
         )
 
+    digest = token_digest(token)
+    cached = verified_access_tokens.get(digest)
+    record_cache_lookup("access_token", hit=cached is not None)
+    if cached is not None:
+        return cached
+
     payload_dict = decode_token(token)
     try:
-        return TokenPayload(**payload_dict)
+        payload = TokenPayload(**payload_dict)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload",
         )
 
+    ttl = token_ttl(payload_dict)
+    if ttl is None or ttl > 0:
+        verified_access_tokens.set(digest, payload, ttl=ttl)
+    return payload
+
 
 TokenPayloadDep = Annotated[TokenPayload, Depends(get_access_payload)]
 
@@ -154,27 +204,37 @@ async def get_refresh_payload(request: Request) -> TokenPayload:
 RefreshPayloadDep = Annotated[TokenPayload, Depends(get_refresh_payload)]
 
 
+async def get_optional_access_payload(request: Request) -> TokenPayload | None:
+    try:
+        return await get_access_payload(request)
+    except HTTPException:
+        return None
+
+
+OptionalTokenPayloadDep = Annotated[TokenPayload | None, Depends(get_optional_access_payload)]
+
+
 
 
 async def get_current_user(
     payload: TokenPayloadDep,
     user_service: UserServiceDep,
 ) -> UserResponse:
-    
+
     if not payload.sub:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token: no subject",
         )
 
-    user = await user_service.get_user_by_id(str(payload.sub))
+    user = await user_service.get_authenticated_user(str(payload.sub))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
 
-    return UserResponse(**user)
+    return user
 
 
 CurrentUserDep = Annotated[UserResponse, Depends(get_current_user)]
@@ -198,4 +258,37 @@ async def require_authenticated(current_user: CurrentUserDep) -> UserResponse:
     return current_user
 
 
-AuthUserDep = Annotated[UserResponse, Depends(require_authenticated)]
\ No newline at end of file
+AuthUserDep = Annotated[UserResponse, Depends(require_authenticated)]
+
+
+
+
+# Metrics
+
+async def require_metrics_token(request: Request):
+    # /metrics is scraped with a static bearer token and disabled without one.
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    auth_header = request.headers.get("Authorization", "")
+    token = auth_header[7:].strip() if auth_header.lower().startswith("bearer ") else ""
+    if not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+MetricsAccessDep = Depends(require_metrics_token)
+
+
+
+
+# Rate limiting
+
+def rate_limited(policy: str):
+    async def check_rate_limit(request: Request, payload: OptionalTokenPayloadDep):
+        await enforce_rate_limit(policy, client_ip(request), user=payload.sub if payload else None)
+
+    return Depends(check_rate_limit)
\ No newline at end of file
@@ -1,9 +1,19 @@
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 
-from utils.indexes import create_indexes
+from core.config import settings
+from db import check_transactions
+from utils.indexes import create_indexes, report_product_query_plans
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.http_metrics import MetricsMiddleware
+from utils.category_snapshot import category_snapshot
+from utils.stock_reservations import run_hold_sweeper
+from repositories.stock_counter_repo import run_stock_compactor
+from utils.order_events import run_outbox_worker
 from repositories.user_repo import UserRepository
 from services.user_service import UserService
 from routes import main_router
@@ -13,6 +23,8 @@ from routes import main_router
 
 app = FastAPI(title="Clothing Store API")
 
+background_tasks: list[asyncio.Task] = []
+
 
 app.include_router(main_router)
 
@@ -23,19 +35,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Retry-After"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
 
+    if settings.MONGO_TRANSACTIONS:
+        await check_transactions()
+
     await create_indexes()
+    if settings.INDEX_REPORT_ON_STARTUP:
+        await report_product_query_plans()
+
+    await category_snapshot.refresh()
+    background_tasks.append(asyncio.create_task(category_snapshot.listen()))
+    background_tasks.append(asyncio.create_task(
+        run_hold_sweeper(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
+    ))
+    background_tasks.append(asyncio.create_task(
+        run_stock_compactor(settings.STOCK_COMPACTION_INTERVAL_SECONDS)
+    ))
+    background_tasks.append(asyncio.create_task(
+        run_outbox_worker(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+    ))
 
     user_repo = UserRepository()
     user_service = UserService(user_repo)
     await user_service.create_initial_admin()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
+
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
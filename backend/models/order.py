@@ -23,7 +23,7 @@ class OrderStatusUpdate(BaseModel):
 
 
 class QuantityUpdate(BaseModel):
-    quantity: int
+    quantity: int = Field(gt=0)
 
 
 class OrderItemVariant(BaseModelConfig):
@@ -36,13 +36,16 @@ class OrderItem(BaseModelConfig):
     product_id: PyObjectId
     name: str
     price: float
-    quantity: int
+    quantity: int = Field(gt=0)
     variant: OrderItemVariant
+    category_id: PyObjectId | None = None
+    category_name: str | None = None
 
     
 
 class OrderCreate(BaseModelConfig):
     items: List[OrderItem]
+    reservation_id: str | None = None
 
 
 
@@ -22,6 +22,12 @@ class ProductCreate(BaseModelConfig):
 
     
 
+class ProductSuggestion(BaseModelConfig):
+    id: PyObjectId = Field(alias="_id")
+    name: str
+
+
+
 class ProductResponse(BaseModelConfig):
     id: PyObjectId = Field(alias="_id")
     name: str
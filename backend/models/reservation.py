@@ -0,0 +1,31 @@
+from pydantic import Field
+from typing import List
+from datetime import datetime
+from models.base import BaseModelConfig, PyObjectId
+from models.order import OrderItemVariant
+
+
+
+
+class ReservationItem(BaseModelConfig):
+    product_id: PyObjectId
+    variant: OrderItemVariant
+    quantity: int = Field(gt=0)
+
+
+class ReservationCreate(BaseModelConfig):
+    items: List[ReservationItem]
+
+
+class ReservationResponse(BaseModelConfig):
+    id: str = Field(alias="_id")
+    expires_at: datetime
+    items: List[ReservationItem]
+
+
+class VariantAvailability(BaseModelConfig):
+    size: str
+    color: str
+    stock: int
+    held: int
+    available: int
@@ -0,0 +1,41 @@
+import asyncio
+import os
+
+from pymongo import ReplaceOne
+
+from db import products_collection, product_prefixes_collection
+from utils.product_query import name_prefixes
+
+
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "500"))
+
+
+async def main():
+    await product_prefixes_collection.delete_many({})
+
+    ops = []
+    indexed = 0
+    async for product in products_collection.find({}, {"name": 1}):
+        if not product.get("name"):
+            continue
+        ops.append(ReplaceOne(
+            {"_id": product["_id"]},
+            {"name": product["name"], "prefixes": name_prefixes(product["name"])},
+            upsert=True,
+        ))
+        if len(ops) >= BATCH_SIZE:
+            await product_prefixes_collection.bulk_write(ops, ordered=False)
+            indexed += len(ops)
+            ops = []
+            print(f"Indexed {indexed} products...")
+
+    if ops:
+        await product_prefixes_collection.bulk_write(ops, ordered=False)
+        indexed += len(ops)
+
+    print("DONE")
+    print(f"products indexed: {indexed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
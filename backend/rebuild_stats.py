@@ -0,0 +1,23 @@
+import asyncio
+
+from repositories.stats_repo import StatsRepository
+from utils.indexes import create_indexes
+
+
+async def main():
+    await create_indexes()
+
+    print("Rebuilding sales rollups...")
+    stats_repo = StatsRepository()
+    await stats_repo.rebuild()
+
+    c1 = await stats_repo.daily.count_documents({})
+    c2 = await stats_repo.category_daily.count_documents({})
+    c3 = await stats_repo.product_daily.count_documents({})
+
+    print("DONE")
+    print(f"sales_daily: {c1}, sales_category_daily: {c2}, sales_product_daily: {c3}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,17 +2,162 @@ from bson import ObjectId
 from datetime import datetime
 from typing import List, Dict, Any
 
+from pymongo import ReturnDocument, UpdateOne
 
-from db import orders_collection, products_collection
+from core.config import settings
+from db import client, orders_collection, products_collection, categories_collection
 from models.order import OrderStatus
+from repositories.outbox_repo import OutboxRepository
+from repositories.stock_counter_repo import StockCounterRepository
+from utils.order_events import deliver_inline, invalidate_order_products
+from utils.pagination import apply_keyset, KEYSET_SORT
+from utils.metrics import instrument_repository
 
 
 
 
+StockLine = tuple[ObjectId, str, str, int]
+
+
+class InsufficientStockError(Exception):
+    def __init__(self, product_id: ObjectId, size: str, color: str):
+        self.product_id = product_id
+        self.size = size
+        self.color = color
+        super().__init__(f"Insufficient stock for product {product_id} ({size}, {color})")
+
+
+
+def group_stock_lines(items: List[Dict[str, Any]]) -> List[StockLine]:
+    lines: Dict[tuple[ObjectId, str, str], int] = {}
+    for item in items:
+        key = (ObjectId(item["product_id"]), item["variant"]["size"], item["variant"]["color"])
+        lines[key] = lines.get(key, 0) + item["quantity"]
+    return [(*key, qty) for key, qty in lines.items()]
+
+
+
+@instrument_repository
 class OrderRepository:
     def __init__(self):
         self.collection = orders_collection
         self.products = products_collection
+        self.categories = categories_collection
+        self.outbox = OutboxRepository()
+        self.counters = StockCounterRepository()
+
+
+    async def _in_transaction(self, write):
+        if not settings.MONGO_TRANSACTIONS:
+            return await write(None)
+        # with_transaction retries the whole callback on TransientTransactionError
+        # (e.g. a write conflict on a hot variant) and retries the commit on
+        # UnknownTransactionCommitResult.
+        async with await client.start_session() as session:
+            return await session.with_transaction(write)
+
+
+    async def _record_event(self, event_type: str, before: dict | None, after: dict | None, session=None):
+        # The outbox is only transactional inside a transaction; without one the
+        # side effects are delivered inline after the write.
+        if session is not None:
+            await self.outbox.enqueue(event_type, before, after, session=session)
+        else:
+            await deliver_inline(event_type, before, after)
+
+
+    async def _snapshot_categories(self, items: List[Dict[str, Any]]) -> set[ObjectId]:
+        product_ids = list({ObjectId(item["product_id"]) for item in items})
+        if not product_ids:
+            return set()
+
+        pipeline = [
+            {"$match": {"_id": {"$in": product_ids}}},
+            {"$project": {"category_id": {"$toObjectId": "$category_id"}, "stock_sharded": 1}},
+            {
+                "$lookup": {
+                    "from": self.categories.name,
+                    "localField": "category_id",
+                    "foreignField": "_id",
+                    "as": "category",
+                }
+            },
+            {"$project": {"category_id": 1, "category_name": {"$first": "$category.name"}, "stock_sharded": 1}},
+        ]
+        snapshots = {p["_id"]: p async for p in self.products.aggregate(pipeline)}
+
+        for item in items:
+            snapshot = snapshots.get(ObjectId(item["product_id"]), {})
+            item["category_id"] = snapshot.get("category_id")
+            item["category_name"] = snapshot.get("category_name")
+
+        return {product_id for product_id, p in snapshots.items() if p.get("stock_sharded")}
+
+
+    async def _reserve_stock(self, lines: List[StockLine], session=None, sharded: set[ObjectId] = frozenset()):
+        document_lines: List[StockLine] = []
+        takes: list = []
+        for line in lines:
+            product_id, size, color, qty = line
+            if product_id not in sharded:
+                document_lines.append(line)
+                continue
+
+            taken = await self.counters.take(product_id, size, color, qty, session=session)
+            if taken is not None:
+                takes.extend(taken)
+            elif await self.counters.has_slots(product_id, size, color, session=session):
+                if session is None:
+                    await self.counters.give_back(takes)
+                raise InsufficientStockError(product_id, size, color)
+            else:
+                document_lines.append(line)
+
+        try:
+            await self._reserve_document_stock(document_lines, session=session)
+        except Exception:
+            if session is None:
+                await self.counters.give_back(takes)
+            raise
+
+
+    async def _reserve_document_stock(self, lines: List[StockLine], session=None):
+        # One guarded update per line: a line that matches nothing is out of
+        # stock. Anything else (network, write concern, ...) is re-raised after
+        # the lines already taken are put back.
+        applied: List[StockLine] = []
+        try:
+            for line in lines:
+                product_id, size, color, qty = line
+                result = await self.products.update_one(
+                    {
+                        "_id": product_id,
+                        "variants": {"$elemMatch": {"size": size, "color": color, "stock": {"$gte": qty}}},
+                    },
+                    {"$inc": {"variants.$[v].stock": -qty}},
+                    array_filters=[{"v.size": size, "v.color": color}],
+                    session=session,
+                )
+                if result.matched_count == 0:
+                    raise InsufficientStockError(product_id, size, color)
+                applied.append(line)
+        except Exception:
+            if session is None:
+                await self._restore_stock(applied)
+            raise
+
+
+    async def _restore_stock(self, lines: List[StockLine], session=None):
+        ops = [
+            UpdateOne(
+                {"_id": product_id},
+                {"$inc": {"variants.$[v].stock": qty}},
+                array_filters=[{"v.size": size, "v.color": color}],
+            )
+            for product_id, size, color, qty in lines
+        ]
+        if ops:
+            await self.products.bulk_write(ops, ordered=False, session=session)
 
     async def get_orders(
         self,
@@ -20,8 +165,10 @@ class OrderRepository:
         limit: int = 10,
         user_id: str | ObjectId | None = None,
         status: str | None = None,
+        cursor: str | None = None,
+        projection: dict | None = None,
     ):
-        query: dict = {}
+        query: dict = apply_keyset({}, cursor)
         if user_id is not None:
             if isinstance(user_id, str):
                 user_id = ObjectId(user_id)
@@ -32,9 +179,9 @@ class OrderRepository:
 
         cursor = (
             self.collection
-            .find(query)
-            .sort("created_at", -1)
-            .skip(skip)
+            .find(query, projection)
+            .sort(KEYSET_SORT)
+            .skip(0 if cursor else skip)
             .limit(limit)
         )
         return await cursor.to_list(length=limit)
@@ -69,9 +216,11 @@ class OrderRepository:
                 item = item.model_dump()
             serialized_items.append(item)
 
+        sharded = await self._snapshot_categories(serialized_items)
         total = sum(i["price"] * i["quantity"] for i in serialized_items)
 
         order_doc = {
+            "_id": ObjectId(),
             "user_id": user_id,
             "status": OrderStatus.PENDING.value,
             "items": serialized_items,
@@ -79,24 +228,28 @@ class OrderRepository:
             "created_at": datetime.utcnow(),
         }
 
+        lines = group_stock_lines(serialized_items)
 
-        for item in serialized_items:
-            product_id = ObjectId(item["product_id"])
-            size = item["variant"]["size"]
-            color = item["variant"]["color"]
-            qty = item["quantity"]
+        # Only the stock update and the order (plus its outbox event) are
+        # written here; cache invalidation and stats rollups run from the outbox.
+        if settings.MONGO_TRANSACTIONS:
+            async def write(session):
+                await self._reserve_stock(lines, session=session, sharded=sharded)
+                await self.collection.insert_one(order_doc, session=session)
+                await self._record_event("order.created", None, order_doc, session=session)
 
-            await self.products.update_one(
-                {
-                    "_id": product_id,
-                    "variants.size": size,
-                    "variants.color": color,
-                },
-                {"$inc": {"variants.$.stock": -qty}},
-            )
+            await self._in_transaction(write)
+        else:
+            await self._reserve_stock(lines, sharded=sharded)
+            try:
+                await self.collection.insert_one(order_doc)
+            except Exception:
+                await self._restore_stock(lines)
+                await invalidate_order_products(serialized_items)
+                raise
+            await self._record_event("order.created", None, order_doc)
 
-        result = await self.collection.insert_one(order_doc)
-        return await self.get_order_by_id(result.inserted_id)
+        return order_doc
 
 
 
@@ -104,18 +257,35 @@ class OrderRepository:
         if isinstance(order_id, str):
             order_id = ObjectId(order_id)
 
-        await self.collection.update_one(
-            {"_id": order_id},
-            {"$set": order_data},
-        )
-        return await self.get_order_by_id(order_id)
+        async def write(session):
+            before = await self.collection.find_one_and_update(
+                {"_id": order_id},
+                {"$set": order_data},
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+            if before is None:
+                return None
+
+            order = {**before, **order_data}
+            await self._record_event("order.updated", before, order, session=session)
+            return order
+
+        return await self._in_transaction(write)
 
 
     async def delete_order(self, order_id: str | ObjectId):
         
         if isinstance(order_id, str):
             order_id = ObjectId(order_id)
-        return await self.collection.delete_one({"_id": order_id})
+
+        async def write(session):
+            order = await self.collection.find_one_and_delete({"_id": order_id}, session=session)
+            if order is not None:
+                await self._record_event("order.deleted", order, None, session=session)
+            return order
+
+        return await self._in_transaction(write)
 
 
 
@@ -126,12 +296,21 @@ class OrderRepository:
 
         if hasattr(item, "model_dump"):
             item = item.model_dump()
+        await self._snapshot_categories([item])
+
+        async def write(session):
+            order = await self.collection.find_one_and_update(
+                {"_id": order_id},
+                {"$push": {"items": item}},
+                return_document=ReturnDocument.AFTER,
+                session=session,
+            )
+            if order is not None:
+                before = {**order, "items": order["items"][:-1]}
+                await self._record_event("order.items_changed", before, order, session=session)
+            return order
 
-        await self.collection.update_one(
-            {"_id": order_id},
-            {"$push": {"items": item}},
-        )
-        return await self.get_order_by_id(order_id)
+        return await self._in_transaction(write)
 
 
 
@@ -142,11 +321,24 @@ class OrderRepository:
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
 
-        await self.collection.update_one(
-            {"_id": order_id},
-            {"$pull": {"items": {"product_id": product_id}}},
-        )
-        return await self.get_order_by_id(order_id)
+        async def write(session):
+            before = await self.collection.find_one_and_update(
+                {"_id": order_id},
+                {"$pull": {"items": {"product_id": product_id}}},
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+            if before is None:
+                return None
+
+            order = {
+                **before,
+                "items": [i for i in before.get("items", []) if i["product_id"] != product_id],
+            }
+            await self._record_event("order.items_changed", before, order, session=session)
+            return order
+
+        return await self._in_transaction(write)
     
 
 
@@ -157,11 +349,27 @@ class OrderRepository:
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
 
-        await self.collection.update_one(
-            {"_id": order_id, "items.product_id": product_id},
-            {"$set": {"items.$.quantity": qty}},
-        )
-        return await self.get_order_by_id(order_id)
+        async def write(session):
+            before = await self.collection.find_one_and_update(
+                {"_id": order_id, "items.product_id": product_id},
+                {"$set": {"items.$.quantity": qty}},
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+            if before is None:
+                return await self.collection.find_one({"_id": order_id}, session=session)
+
+            items = [dict(i) for i in before["items"]]
+            for item in items:
+                if item["product_id"] == product_id:
+                    item["quantity"] = qty
+                    break
+
+            order = {**before, "items": items}
+            await self._record_event("order.items_changed", before, order, session=session)
+            return order
+
+        return await self._in_transaction(write)
 
 
 
@@ -170,11 +378,21 @@ class OrderRepository:
         if isinstance(order_id, str):
             order_id = ObjectId(order_id)
 
-        await self.collection.update_one(
-            {"_id": order_id},
-            {"$set": {"status": status.value}},
-        )
-        return await self.get_order_by_id(order_id)
+        async def write(session):
+            before = await self.collection.find_one_and_update(
+                {"_id": order_id},
+                {"$set": {"status": status.value}},
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+            if before is None:
+                return None
+
+            order = {**before, "status": status.value}
+            await self._record_event("order.status_changed", before, order, session=session)
+            return order
+
+        return await self._in_transaction(write)
 
 
 
@@ -183,30 +401,19 @@ class OrderRepository:
         if isinstance(order_id, str):
             order_id = ObjectId(order_id)
 
-        order = await self.get_order_by_id(order_id)
-        if not order:
-            return None
+        async def write(session):
+            before = await self.collection.find_one_and_update(
+                {"_id": order_id, "status": {"$ne": OrderStatus.CANCELED.value}},
+                {"$set": {"status": OrderStatus.CANCELED.value}},
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+            if before is None:
+                return await self.collection.find_one({"_id": order_id}, session=session)
 
-        if order.get("status") == OrderStatus.CANCELED.value:
+            order = {**before, "status": OrderStatus.CANCELED.value}
+            await self._restore_stock(group_stock_lines(order.get("items", [])), session=session)
+            await self._record_event("order.canceled", before, order, session=session)
             return order
 
-        for item in order.get("items", []):
-            product_id = ObjectId(item["product_id"])
-            size = item["variant"]["size"]
-            color = item["variant"]["color"]
-            qty = item["quantity"]
-
-            await self.products.update_one(
-                {
-                    "_id": product_id,
-                    "variants.size": size,
-                    "variants.color": color,
-                },
-                {"$inc": {"variants.$.stock": qty}},
-            )
-
-        await self.collection.update_one(
-            {"_id": order_id},
-            {"$set": {"status": OrderStatus.CANCELED.value}},
-        )
-        return await self.get_order_by_id(order_id)
+        return await self._in_transaction(write)
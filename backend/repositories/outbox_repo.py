@@ -0,0 +1,135 @@
+import asyncio
+import uuid
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import List
+
+from pymongo import UpdateOne
+
+from core.config import settings
+from db import order_events_collection
+from utils.metrics import instrument_repository
+
+
+
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# Set whenever this process writes an event, so the local worker picks it up
+# without waiting for the next poll. Other processes still find it by polling.
+outbox_wakeup = asyncio.Event()
+
+
+
+
+# Order side effects (stats rollups, cache invalidation, notifications) are
+# written to order_events in the same transaction as the order change and
+# delivered at least once by utils/order_events.run_outbox_worker. Each event
+# records which handlers already ran, so a retry only repeats the failed ones.
+@instrument_repository
+class OutboxRepository:
+    def __init__(self):
+        self.collection = order_events_collection
+
+
+    async def enqueue(self, event_type: str, before: dict | None, after: dict | None, session=None):
+        now = datetime.utcnow()
+        order = after if after is not None else before
+        event = {
+            "_id": ObjectId(),
+            "type": event_type,
+            "order_id": order["_id"],
+            "before": before,
+            "after": after,
+            "status": PENDING,
+            "handled": [],
+            "attempts": 0,
+            "created_at": now,
+            "available_at": now,
+        }
+        await self.collection.insert_one(event, session=session)
+        outbox_wakeup.set()
+        return event
+
+
+    async def claim_batch(self, limit: int) -> List[dict]:
+        now = datetime.utcnow()
+        due = {"status": PENDING, "available_at": {"$lte": now}}
+        ids = [
+            e["_id"]
+            async for e in self.collection.find(due, {"_id": 1}).sort("available_at", 1).limit(limit)
+        ]
+        if not ids:
+            return []
+
+        # Claiming pushes available_at past the lease, so an event whose worker
+        # dies mid-batch is picked up again once the lease runs out.
+        lease = uuid.uuid4().hex
+        await self.collection.update_many(
+            {**due, "_id": {"$in": ids}},
+            {
+                "$set": {"lease": lease, "available_at": now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)},
+                "$inc": {"attempts": 1},
+            },
+        )
+        return await self.collection.find({"lease": lease}).sort("_id", 1).to_list(length=limit)
+
+
+    async def mark_handled(self, event_ids: List[ObjectId], handler: str, session=None):
+        if event_ids:
+            await self.collection.update_many(
+                {"_id": {"$in": event_ids}},
+                {"$addToSet": {"handled": handler}},
+                session=session,
+            )
+
+
+    async def take_handler(self, event_id: ObjectId, handler: str, session=None) -> bool:
+        result = await self.collection.update_one(
+            {"_id": event_id, "handled": {"$ne": handler}},
+            {"$addToSet": {"handled": handler}},
+            session=session,
+        )
+        return result.modified_count == 1
+
+
+    async def pending_for(self, handler: str, session=None) -> List[ObjectId]:
+        query = {"status": PENDING, "handled": {"$ne": handler}}
+        return [e["_id"] async for e in self.collection.find(query, {"_id": 1}, session=session)]
+
+
+    async def complete(self, event_ids: List[ObjectId]):
+        if event_ids:
+            await self.collection.update_many(
+                {"_id": {"$in": event_ids}},
+                {"$set": {"status": DONE, "processed_at": datetime.utcnow()}, "$unset": {"lease": ""}},
+            )
+
+
+    async def defer(self, event_ids: List[ObjectId], delay: float):
+        # Hands the events back without spending an attempt.
+        if event_ids:
+            await self.collection.update_many(
+                {"_id": {"$in": event_ids}},
+                {
+                    "$set": {"available_at": datetime.utcnow() + timedelta(seconds=delay)},
+                    "$inc": {"attempts": -1},
+                    "$unset": {"lease": ""},
+                },
+            )
+
+
+    async def retry_later(self, events: List[dict]):
+        now = datetime.utcnow()
+        ops = []
+        for event in events:
+            if event["attempts"] >= settings.OUTBOX_MAX_ATTEMPTS:
+                update = {"$set": {"status": FAILED}, "$unset": {"lease": ""}}
+            else:
+                backoff = min(2 ** event["attempts"], 300)
+                update = {"$set": {"available_at": now + timedelta(seconds=backoff)}, "$unset": {"lease": ""}}
+            ops.append(UpdateOne({"_id": event["_id"]}, update))
+        if ops:
+            await self.collection.bulk_write(ops, ordered=False)
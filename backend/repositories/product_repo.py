@@ -2,13 +2,53 @@ from bson import ObjectId
 from datetime import datetime
 from typing import Optional
 
-from db import products_collection
-from models.product import ProductVariant
-
+from pymongo import ReturnDocument
 
+from db import products_collection, product_prefixes_collection
+from models.product import ProductVariant
+from utils.pagination import apply_keyset
+from utils.product_query import (
+    build_product_query,
+    name_prefixes,
+    prefix_terms,
+    product_sort,
+    variant_filter_expression,
+)
+from utils.redis import invalidate_product_cache, bump_product_listing_generation
+from utils.metrics import instrument_repository
+
+
+@instrument_repository
 class ProductRepository:
     def __init__(self):
         self.collection = products_collection
+        self.prefixes = product_prefixes_collection
+
+
+    async def _invalidate(self, product_id: ObjectId, *category_ids):
+        await invalidate_product_cache(product_id)
+        await bump_product_listing_generation(*category_ids)
+
+
+    async def _index_name(self, product_id: ObjectId, name: str):
+        await self.prefixes.update_one(
+            {"_id": product_id},
+            {"$set": {"name": name, "prefixes": name_prefixes(name)}},
+            upsert=True,
+        )
+
+
+    async def _update_and_invalidate(self, query: dict, update: dict):
+        product = await self.collection.find_one_and_update(
+            query,
+            update,
+            return_document=ReturnDocument.AFTER,
+        )
+        if product is None:
+            return await self.get_product_by_id(query["_id"])
+
+        await self._invalidate(product["_id"], product.get("category_id"))
+        return product
 
     async def get_products(
         self,
@@ -19,62 +59,91 @@ class ProductRepository:
         color: Optional[str] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
+        cursor: Optional[str] = None,
+        projection: Optional[dict] = None,
+        in_stock_only: bool = False,
+        q: Optional[str] = None,
     ):
-        query: dict = {}
-
-        if category_id:
-            query["category_id"] = ObjectId(category_id)
+        query, variant_filter = build_product_query(
+            category_id=category_id,
+            size=size,
+            color=color,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock_only=in_stock_only,
+            q=q,
+        )
+        apply_keyset(query, cursor)
+        sort = product_sort(q)
+
+        if not variant_filter:
+            products_cursor = (
+                self.collection
+                .find(query, projection)
+                .sort(sort)
+                .skip(0 if cursor else skip)
+                .limit(limit)
+            )
+            return await products_cursor.to_list(length=limit)
+
+        pipeline = [
+            {"$match": query},
+            {"$sort": dict(sort)},
+            {"$skip": 0 if cursor else skip},
+            {"$limit": limit},
+        ]
+        matching_variants = variant_filter_expression(variant_filter)
+        if projection is None:
+            pipeline.append({"$set": {"variants": matching_variants}})
+        elif "variants" in projection:
+            pipeline.append({"$project": {**projection, "variants": matching_variants}})
+        else:
+            pipeline.append({"$project": projection})
+
+        return await self.collection.aggregate(pipeline).to_list(length=limit)
 
-        variant_filter = {}
-        if size:
-            variant_filter["size"] = size
-        if color:
-            variant_filter["color"] = color
 
-        if variant_filter:
-            query["variants"] = {"$elemMatch": variant_filter}
 
-        if min_price is not None or max_price is not None:
-            price_filter = {}
-            if min_price is not None:
-                price_filter["$gte"] = min_price
-            if max_price is not None:
-                price_filter["$lte"] = max_price
-            query["price"] = price_filter
 
-        cursor = (
-            self.collection
-            .find(query)
-            .sort("created_at", -1)
-            .skip(skip)
-            .limit(limit)
-        )
+    async def get_product_by_id(self, product_id: str | ObjectId):
+        if isinstance(product_id, str):
+            product_id = ObjectId(product_id)
+        return await self.collection.find_one({"_id": product_id})
 
-        products = await cursor.to_list(length=limit)
 
-        if variant_filter:
-            for p in products:
-                p["variants"] = [
-                    v for v in p.get("variants", [])
-                    if all(v.get(k) == val for k, val in variant_filter.items())
-                ]
 
-        return products
+    async def get_products_by_ids(
+        self,
+        product_ids: list[str | ObjectId],
+        projection: Optional[dict] = None,
+    ):
+        ids = list({ObjectId(pid) if isinstance(pid, str) else pid for pid in product_ids})
+        cursor = self.collection.find({"_id": {"$in": ids}}, projection)
+        return await cursor.to_list(length=len(ids))
 
 
 
+    async def suggest(self, q: str, limit: int = 10):
+        terms = prefix_terms(q)
+        if not terms:
+            return []
 
-    async def get_product_by_id(self, product_id: str | ObjectId):
-        if isinstance(product_id, str):
-            product_id = ObjectId(product_id)
-        return await self.collection.find_one({"_id": product_id})
+        cursor = (
+            self.prefixes
+            .find({"prefixes": {"$all": terms}}, {"name": 1})
+            .sort("name", 1)
+            .limit(limit)
+        )
+        return await cursor.to_list(length=limit)
 
 
 
     async def create_product(self, product_data: dict):
         product_data["created_at"] = datetime.utcnow()
         result = await self.collection.insert_one(product_data)
-        return await self.get_product_by_id(result.inserted_id)
+        await self._index_name(result.inserted_id, product_data["name"])
+        await bump_product_listing_generation(product_data.get("category_id"))
+        return {**product_data, "_id": result.inserted_id}
 
 
 
@@ -82,17 +151,31 @@ class ProductRepository:
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
 
-        await self.collection.update_one(
+        before = await self.collection.find_one_and_update(
             {"_id": product_id},
             {"$set": data},
+            return_document=ReturnDocument.BEFORE,
         )
-        return await self.get_product_by_id(product_id)
+        if before is None:
+            return None
+
+        if "name" in data and data["name"] != before.get("name"):
+            await self._index_name(product_id, data["name"])
+        await self._invalidate(product_id, before.get("category_id"), data.get("category_id"))
+        return {**before, **data}
 
     async def delete_product(self, product_id: str | ObjectId):
 
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
-        return await self.collection.delete_one({"_id": product_id})
+        product = await self.collection.find_one_and_delete(
+            {"_id": product_id},
+            projection={"category_id": 1},
+        )
+        if product is not None:
+            await self.prefixes.delete_one({"_id": product_id})
+            await self._invalidate(product_id, product.get("category_id"))
+        return product
 
 
     async def add_variant(self, product_id: str | ObjectId, variant: dict | ProductVariant):
@@ -103,11 +186,10 @@ class ProductRepository:
         if hasattr(variant, "model_dump"):
             variant = variant.model_dump()
 
-        await self.collection.update_one(
+        return await self._update_and_invalidate(
             {"_id": product_id},
             {"$push": {"variants": variant}},
         )
-        return await self.get_product_by_id(product_id)
 
 
 
@@ -116,11 +198,10 @@ class ProductRepository:
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
 
-        await self.collection.update_one(
+        return await self._update_and_invalidate(
             {"_id": product_id},
             {"$pull": {"variants": {"size": size, "color": color}}},
         )
-        return await self.get_product_by_id(product_id)
 
     async def update_variant_stock(
         self,
@@ -132,7 +213,7 @@ class ProductRepository:
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
 
-        await self.collection.update_one(
+        return await self._update_and_invalidate(
             {
                 "_id": product_id,
                 "variants.size": size,
@@ -142,7 +223,6 @@ class ProductRepository:
                 "$inc": {"variants.$.stock": diff},
             },
         )
-        return await self.get_product_by_id(product_id)
 
 
     async def update_variant_fields(
@@ -157,7 +237,7 @@ class ProductRepository:
 
         set_ops = {f"variants.$.{k}": v for k, v in data.items()}
 
-        await self.collection.update_one(
+        return await self._update_and_invalidate(
             {
                 "_id": product_id,
                 "variants.size": size,
@@ -165,4 +245,3 @@ class ProductRepository:
             },
             {"$set": set_ops},
         )
-        return await self.get_product_by_id(product_id)
@@ -0,0 +1,348 @@
+import asyncio
+from bson import ObjectId
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable
+
+from pymongo import UpdateOne
+
+
+from core.config import settings
+from db import (
+    client,
+    sales_daily_collection,
+    sales_category_daily_collection,
+    sales_product_daily_collection,
+    orders_collection,
+    products_collection,
+    categories_collection,
+)
+from models.order import OrderStatus
+from repositories.outbox_repo import OutboxRepository
+from utils.redis import bump_stats_generation, redis_lock
+from utils.metrics import instrument_repository
+
+
+
+
+# Held by rebuild() and by the outbox stats handler while it applies a batch, so
+# incremental deltas never land in the middle of a rebuild.
+STATS_LOCK = "stats-rollups"
+STATS_REBUILD_LOCK_TTL_MS = 600000
+
+
+def _day(created_at: datetime) -> datetime:
+    return datetime(created_at.year, created_at.month, created_at.day)
+
+
+def _day_range(start: datetime, end: datetime) -> dict:
+    return {"day": {"$gte": start, "$lt": end}}
+
+
+def _unsnapshotted_product_ids(*orders) -> set[ObjectId]:
+    return {
+        ObjectId(item["product_id"])
+        for order in orders if order
+        for item in order.get("items", [])
+        if not item.get("category_id")
+    }
+
+
+def order_contributions(order: dict | None, category_by_product: Dict[ObjectId, Any]) -> Dict[tuple, float]:
+    contributions: Dict[tuple, float] = defaultdict(int)
+    if not order or order.get("status") == OrderStatus.CANCELED.value:
+        return contributions
+
+    day = _day(order["created_at"])
+    contributions[("daily", day, None, "total_revenue")] += order.get("total", 0)
+    contributions[("daily", day, None, "orders_count")] += 1
+
+    for item in order.get("items", []):
+        product_id = ObjectId(item["product_id"])
+        revenue = item["price"] * item["quantity"]
+
+        contributions[("product", day, product_id, "total_quantity")] += item["quantity"]
+        contributions[("product", day, product_id, "total_revenue")] += revenue
+
+        category_id = item.get("category_id") or category_by_product.get(product_id)
+        if category_id is not None:
+            category_id = ObjectId(category_id)
+            contributions[("category", day, category_id, "total_items")] += item["quantity"]
+            contributions[("category", day, category_id, "total_revenue")] += revenue
+
+    return contributions
+
+
+
+
+@instrument_repository
+class StatsRepository:
+    def __init__(self):
+        self.daily = sales_daily_collection
+        self.category_daily = sales_category_daily_collection
+        self.product_daily = sales_product_daily_collection
+        self.orders = orders_collection
+        self.products = products_collection
+        self.categories = categories_collection
+
+
+    async def _categories_for(self, product_ids: Iterable[ObjectId]) -> Dict[ObjectId, Any]:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        cursor = self.products.find({"_id": {"$in": product_ids}}, {"category_id": 1})
+        return {
+            p["_id"]: ObjectId(p["category_id"])
+            async for p in cursor
+            if p.get("category_id")
+        }
+
+
+    async def apply_order_change(self, before: dict | None, after: dict | None, session=None) -> set[str]:
+        category_by_product = await self._categories_for(_unsnapshotted_product_ids(before, after))
+
+        delta: Dict[tuple, float] = defaultdict(int)
+        for key, value in order_contributions(after, category_by_product).items():
+            delta[key] += value
+        for key, value in order_contributions(before, category_by_product).items():
+            delta[key] -= value
+
+        increments: Dict[tuple, Dict[str, float]] = defaultdict(dict)
+        for (kind, day, key, field), value in delta.items():
+            if value:
+                increments[(kind, day, key)][field] = value
+
+        ops: Dict[str, list] = defaultdict(list)
+        for (kind, day, key), inc in increments.items():
+            if kind == "daily":
+                query = {"day": day}
+            elif kind == "category":
+                query = {"day": day, "category_id": key}
+            else:
+                query = {"day": day, "product_id": key}
+            ops[kind].append(UpdateOne(query, {"$inc": inc}, upsert=True))
+
+        collections = {
+            "daily": self.daily,
+            "category": self.category_daily,
+            "product": self.product_daily,
+        }
+        for kind, kind_ops in ops.items():
+            await collections[kind].bulk_write(kind_ops, ordered=False, session=session)
+
+        # Inside a transaction the caller bumps the cached months after commit,
+        # otherwise a reader could cache the old rollups under the new generation.
+        months = {day.strftime("%Y-%m") for _, day, _ in increments}
+        if session is None:
+            await bump_stats_generation(*months)
+        return months
+
+
+    async def _months(self) -> set[str]:
+        return {day.strftime("%Y-%m") for day in await self.daily.distinct("day")}
+
+
+    async def rebuild(self):
+        while True:
+            async with redis_lock(STATS_LOCK, ttl_ms=STATS_REBUILD_LOCK_TTL_MS) as acquired:
+                if acquired:
+                    return await self._rebuild()
+            await asyncio.sleep(0.1)
+
+
+    async def _rebuild(self):
+        # The pending events and the three aggregations are read from one
+        # snapshot. Events commit together with their order, so the changes of
+        # exactly these events are in the aggregated totals; they are marked
+        # handled so the outbox does not apply them again. Later events are left
+        # to the outbox (its stats handler waits on STATS_LOCK meanwhile).
+        # Without transactions there is no outbox and no snapshot.
+        outbox = OutboxRepository()
+        months = await self._months()
+
+        if settings.MONGO_TRANSACTIONS:
+            async with await client.start_session(snapshot=True) as session:
+                pending, daily, by_category, by_product = await self._aggregate_rollups(outbox, session)
+        else:
+            pending, daily, by_category, by_product = await self._aggregate_rollups(outbox, None)
+
+        for collection, docs in (
+            (self.daily, daily),
+            (self.category_daily, by_category),
+            (self.product_daily, by_product),
+        ):
+            await collection.delete_many({})
+            if docs:
+                await collection.insert_many(docs, ordered=False)
+
+        await outbox.mark_handled(pending, "stats")
+
+        # Months that lost all their rollups need a new generation too.
+        await bump_stats_generation(*(months | await self._months()))
+
+
+    async def _aggregate_rollups(self, outbox: OutboxRepository, session):
+        not_canceled = {"$match": {"status": {"$ne": OrderStatus.CANCELED.value}}}
+        day = {"$dateTrunc": {"date": "$created_at", "unit": "day"}}
+
+        pending = await outbox.pending_for("stats", session=session)
+
+        daily = await self.orders.aggregate([
+            not_canceled,
+            {
+                "$group": {
+                    "_id": day,
+                    "total_revenue": {"$sum": "$total"},
+                    "orders_count": {"$sum": 1},
+                }
+            },
+            {"$project": {"_id": 0, "day": "$_id", "total_revenue": 1, "orders_count": 1}},
+        ], session=session).to_list(length=None)
+
+        # Items without a category snapshot fall back to the product's current
+        # category, as in order_contributions().
+        by_category = await self.orders.aggregate([
+            not_canceled,
+            {"$unwind": "$items"},
+            {
+                "$lookup": {
+                    "from": self.products.name,
+                    "let": {"product_id": {"$toObjectId": "$items.product_id"}},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$_id", "$$product_id"]}}},
+                        {"$project": {"_id": 0, "category_id": 1}},
+                    ],
+                    "as": "product",
+                }
+            },
+            {"$set": {"category_id": {"$ifNull": ["$items.category_id", {"$first": "$product.category_id"}]}}},
+            {"$match": {"category_id": {"$ne": None}}},
+            {
+                "$group": {
+                    "_id": {"day": day, "category_id": {"$toObjectId": "$category_id"}},
+                    "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+                    "total_items": {"$sum": "$items.quantity"},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "day": "$_id.day",
+                    "category_id": "$_id.category_id",
+                    "total_revenue": 1,
+                    "total_items": 1,
+                }
+            },
+        ], session=session).to_list(length=None)
+
+        by_product = await self.orders.aggregate([
+            not_canceled,
+            {"$unwind": "$items"},
+            {
+                "$group": {
+                    "_id": {"day": day, "product_id": {"$toObjectId": "$items.product_id"}},
+                    "total_quantity": {"$sum": "$items.quantity"},
+                    "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "day": "$_id.day",
+                    "product_id": "$_id.product_id",
+                    "total_quantity": 1,
+                    "total_revenue": 1,
+                }
+            },
+        ], session=session).to_list(length=None)
+
+        return pending, daily, by_category, by_product
+
+
+
+
+    async def first_day(self) -> datetime | None:
+        doc = await self.daily.find_one({}, {"day": 1}, sort=[("day", 1)])
+        return doc["day"] if doc else None
+
+
+    async def category_totals(self, start: datetime, end: datetime):
+        pipeline = [
+            {"$match": _day_range(start, end)},
+            {
+                "$group": {
+                    "_id": "$category_id",
+                    "total_revenue": {"$sum": "$total_revenue"},
+                    "total_items": {"$sum": "$total_items"},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "category_id": {"$toString": "$_id"},
+                    "total_revenue": 1,
+                    "total_items": 1,
+                }
+            },
+        ]
+        return await self.category_daily.aggregate(pipeline).to_list(length=None)
+
+
+    async def monthly_revenue(self, start: datetime, end: datetime):
+        pipeline = [
+            {"$match": _day_range(start, end)},
+            {
+                "$group": {
+                    "_id": {
+                        "year": {"$year": "$day"},
+                        "month": {"$month": "$day"},
+                    },
+                    "total_revenue": {"$sum": "$total_revenue"},
+                    "orders_count": {"$sum": "$orders_count"},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "year": "$_id.year",
+                    "month": "$_id.month",
+                    "total_revenue": 1,
+                    "orders_count": 1,
+                }
+            },
+        ]
+        return await self.daily.aggregate(pipeline).to_list(length=None)
+
+
+    async def product_totals(self, start: datetime, end: datetime):
+        pipeline = [
+            {"$match": _day_range(start, end)},
+            {
+                "$group": {
+                    "_id": "$product_id",
+                    "total_quantity": {"$sum": "$total_quantity"},
+                    "total_revenue": {"$sum": "$total_revenue"},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "product_id": {"$toString": "$_id"},
+                    "total_quantity": 1,
+                    "total_revenue": 1,
+                }
+            },
+        ]
+        return await self.product_daily.aggregate(pipeline).to_list(length=None)
+
+
+    async def category_names(self, category_ids: Iterable[str]) -> Dict[str, str]:
+        ids = [ObjectId(c) for c in category_ids if ObjectId.is_valid(c)]
+        cursor = self.categories.find({"_id": {"$in": ids}}, {"name": 1})
+        return {str(c["_id"]): c.get("name") async for c in cursor}
+
+
+    async def product_names(self, product_ids: Iterable[str]) -> Dict[str, str]:
+        ids = [ObjectId(p) for p in product_ids if ObjectId.is_valid(p)]
+        cursor = self.products.find({"_id": {"$in": ids}}, {"name": 1})
+        return {str(p["_id"]): p.get("name") async for p in cursor}
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import random
+from bson import ObjectId
+from typing import Dict, Iterable, List
+
+from pymongo import ReturnDocument, UpdateOne
+
+from core.config import settings
+from db import products_collection, stock_counters_collection
+from utils.metrics import instrument_repository
+from utils.redis import redis_lock, invalidate_product_cache, bump_product_listing_generation
+
+
+logger = logging.getLogger(__name__)
+
+VariantKey = tuple[ObjectId, str, str]
+
+
+def _variant_query(product_id: ObjectId, size: str, color: str) -> dict:
+    return {"product_id": product_id, "size": size, "color": color}
+
+
+def _slot_shares(amount: int, slots: int) -> List[int]:
+    base, extra = divmod(amount, slots)
+    return [base + (1 if i < extra else 0) for i in range(slots)]
+
+
+
+# Hot variants keep their stock budget spread over N counter slots. A slot
+# holds `remaining` (budget a checkout may still take) and `used` (taken but
+# not yet subtracted from products.variants[].stock). Checkouts only touch one
+# slot, so they no longer serialize on the product document. The compactor
+# folds `used` back into the product and grants the rest of the stock to slots.
+@instrument_repository
+class StockCounterRepository:
+    def __init__(self):
+        self.collection = stock_counters_collection
+        self.products = products_collection
+
+
+    async def _give_back(self, takes: list[tuple[ObjectId, int]], session=None):
+        ops = [
+            UpdateOne({"_id": slot_id}, {"$inc": {"remaining": qty, "used": -qty}})
+            for slot_id, qty in takes
+        ]
+        if ops:
+            await self.collection.bulk_write(ops, ordered=False, session=session)
+
+
+    async def _take_guarded(self, slot_query: dict, qty: int, session=None) -> ObjectId | None:
+        slot = await self.collection.find_one_and_update(
+            {**slot_query, "remaining": {"$gte": qty}},
+            {"$inc": {"remaining": -qty, "used": qty}},
+            projection={"_id": 1},
+            session=session,
+        )
+        return slot["_id"] if slot else None
+
+
+    async def take(self, product_id: ObjectId, size: str, color: str, qty: int, session=None) -> list[tuple[ObjectId, int]] | None:
+        variant = _variant_query(product_id, size, color)
+
+        slot_id = await self._take_guarded(
+            {**variant, "slot": random.randrange(settings.STOCK_COUNTER_SLOTS)}, qty, session,
+        )
+        if slot_id is not None:
+            return [(slot_id, qty)]
+
+        for _ in range(3):
+            slots = await self.collection.find(
+                {**variant, "remaining": {"$gt": 0}},
+                {"remaining": 1},
+                session=session,
+            ).to_list(length=None)
+            if sum(s["remaining"] for s in slots) < qty:
+                return None
+
+            slots.sort(key=lambda s: s["remaining"], reverse=True)
+            takes: list[tuple[ObjectId, int]] = []
+            need = qty
+            for slot in slots:
+                portion = min(need, slot["remaining"])
+                if await self._take_guarded({"_id": slot["_id"]}, portion, session) is None:
+                    break
+                takes.append((slot["_id"], portion))
+                need -= portion
+                if need == 0:
+                    return takes
+
+            await self._give_back(takes, session)
+
+        return None
+
+
+    async def give_back(self, takes: list[tuple[ObjectId, int]], session=None):
+        await self._give_back(takes, session)
+
+
+    async def has_slots(self, product_id: ObjectId, size: str, color: str, session=None) -> bool:
+        query = _variant_query(product_id, size, color)
+        return await self.collection.count_documents(query, limit=1, session=session) > 0
+
+
+    async def unfolded_usage(self, product_ids: Iterable[ObjectId]) -> Dict[VariantKey, int]:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        pipeline = [
+            {"$match": {"product_id": {"$in": product_ids}, "used": {"$gt": 0}}},
+            {
+                "$group": {
+                    "_id": {"product_id": "$product_id", "size": "$size", "color": "$color"},
+                    "used": {"$sum": "$used"},
+                }
+            },
+        ]
+        return {
+            (doc["_id"]["product_id"], doc["_id"]["size"], doc["_id"]["color"]): doc["used"]
+            async for doc in self.collection.aggregate(pipeline)
+        }
+
+
+    async def enable(self, product_id: ObjectId):
+        product = await self.products.find_one_and_update(
+            {"_id": product_id},
+            {"$set": {"stock_sharded": True}},
+            projection={"variants": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if product is None:
+            return None
+        await self.compact_product(product)
+        return product
+
+
+    async def disable(self, product_id: ObjectId):
+        if await self.products.count_documents({"_id": product_id}, limit=1) == 0:
+            return None
+
+        # The flag is cleared last: until then checkouts go through the slots,
+        # so none of them reads variants.stock while it still includes usage
+        # that has not been folded in. The compaction lock keeps the compactor
+        # from granting new budgets meanwhile.
+        while True:
+            async with redis_lock(f"stock-compact:{product_id}", ttl_ms=30000) as acquired:
+                if acquired:
+                    await self._drain(product_id)
+                    break
+            await asyncio.sleep(0.1)
+
+        return await self.products.find_one_and_update(
+            {"_id": product_id},
+            {"$unset": {"stock_sharded": ""}},
+            projection={"variants": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+    async def _drain(self, product_id: ObjectId):
+        # With no budget left, checkouts on a variant that still has slots are
+        # refused (see OrderRepository._reserve_stock) instead of falling back
+        # to the product document.
+        await self.collection.update_many({"product_id": product_id}, {"$set": {"remaining": 0}})
+
+        async for slot in self.collection.find({"product_id": product_id}, {"size": 1, "color": 1}):
+            while True:
+                current = await self.collection.find_one({"_id": slot["_id"]}, {"used": 1})
+                if current is None:
+                    break
+                used = current.get("used", 0)
+                if used:
+                    # Fold before releasing the usage: a crash in between
+                    # under-sells rather than oversells.
+                    await self._fold(product_id, slot["size"], slot["color"], used)
+                    await self.collection.update_one({"_id": slot["_id"]}, {"$inc": {"used": -used}})
+                # A checkout may have given stock back to the slot since the
+                # read; delete it only once nothing is left to fold.
+                result = await self.collection.delete_one({"_id": slot["_id"], "used": 0})
+                if result.deleted_count:
+                    break
+
+
+    async def _fold(self, product_id: ObjectId, size: str, color: str, used: int) -> int | None:
+        product = await self.products.find_one_and_update(
+            {"_id": product_id},
+            {"$inc": {"variants.$[v].stock": -used}},
+            array_filters=[{"v.size": size, "v.color": color}],
+            projection={"variants": 1, "category_id": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if product is None:
+            return None
+
+        await invalidate_product_cache(product_id)
+        await bump_product_listing_generation(product.get("category_id"))
+        for variant in product.get("variants", []):
+            if variant["size"] == size and variant["color"] == color:
+                return variant["stock"]
+        return None
+
+
+    async def compact_variant(self, product_id: ObjectId, size: str, color: str, stock: int):
+        query = _variant_query(product_id, size, color)
+        slots = {s["slot"]: s for s in await self.collection.find(query).to_list(length=None)}
+
+        missing = [i for i in range(settings.STOCK_COUNTER_SLOTS) if i not in slots]
+        if missing:
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {**query, "slot": i},
+                    {"$setOnInsert": {"remaining": 0, "used": 0}},
+                    upsert=True,
+                )
+                for i in missing
+            ], ordered=False)
+
+        used = sum(s.get("used", 0) for s in slots.values())
+        if used:
+            # Subtract from the product first: a crash in between under-sells
+            # rather than oversells.
+            folded_stock = await self._fold(product_id, size, color, used)
+            if folded_stock is not None:
+                stock = folded_stock
+            await self.collection.bulk_write([
+                UpdateOne({"_id": s["_id"]}, {"$inc": {"used": -s["used"]}})
+                for s in slots.values() if s.get("used")
+            ], ordered=False)
+
+        budgeted = sum(s.get("remaining", 0) for s in slots.values())
+        unallocated = stock - budgeted
+        if unallocated > 0:
+            shares = _slot_shares(unallocated, settings.STOCK_COUNTER_SLOTS)
+            await self.collection.bulk_write([
+                UpdateOne({**query, "slot": i}, {"$inc": {"remaining": share}})
+                for i, share in enumerate(shares) if share
+            ], ordered=False)
+        elif unallocated < 0:
+            excess = -unallocated
+            for slot in sorted(slots.values(), key=lambda s: s.get("remaining", 0), reverse=True):
+                portion = min(excess, slot.get("remaining", 0))
+                if not portion:
+                    continue
+                result = await self.collection.update_one(
+                    {"_id": slot["_id"], "remaining": {"$gte": portion}},
+                    {"$inc": {"remaining": -portion}},
+                )
+                if result.modified_count:
+                    excess -= portion
+                if excess == 0:
+                    break
+
+
+    async def compact_product(self, product: dict) -> bool:
+        # Budgets are granted from a read of the slots, so two compactors
+        # working on the same product at once would grant the same stock twice.
+        async with redis_lock(f"stock-compact:{product['_id']}", ttl_ms=30000) as acquired:
+            if not acquired:
+                return False
+            for variant in product.get("variants", []):
+                await self.compact_variant(product["_id"], variant["size"], variant["color"], variant["stock"])
+            return True
+
+
+    async def compact_all(self) -> int:
+        compacted = 0
+        async for product in self.products.find({"stock_sharded": True}, {"variants": 1}):
+            if await self.compact_product(product):
+                compacted += 1
+        return compacted
+
+
+
+
+async def run_stock_compactor(interval: float):
+    counters = StockCounterRepository()
+    while True:
+        try:
+            await counters.compact_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("stock counter compaction failed")
+        await asyncio.sleep(interval)
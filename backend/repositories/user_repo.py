@@ -1,26 +1,39 @@
 from bson import ObjectId
 from datetime import datetime
 
+from pymongo import ReturnDocument
+
 
 
 from db import users_collection
 from models.user import UserRole
+from utils.pagination import apply_keyset, KEYSET_SORT
+from utils.user_cache import invalidate_user_cache
+from utils.metrics import instrument_repository
 
 
 
+@instrument_repository
 class UserRepository:
     def __init__(self):
         self.collection = users_collection
 
 
-    async def get_users(self, skip: int = 0, limit: int = 10):
-        cursor = (
+    async def get_users(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: str | None = None,
+        projection: dict | None = None,
+    ):
+        users = (
             self.collection
-            .find()
-            .skip(skip)
+            .find(apply_keyset({}, cursor), projection)
+            .sort(KEYSET_SORT)
+            .skip(0 if cursor else skip)
             .limit(limit)
         )
-        return await cursor.to_list(length=limit)
+        return await users.to_list(length=limit)
     
 
     async def get_user_by_id(self, user_id: str | ObjectId):
@@ -50,32 +63,40 @@ class UserRepository:
         user_data["created_at"] = datetime.utcnow()
 
         result = await self.collection.insert_one(user_data)
-        return await self.get_user_by_id(result.inserted_id)
+        return {**user_data, "_id": result.inserted_id}
     
 
-    async def update_user(self, user_id: str | ObjectId, user_data: dict):
+    async def update_user(self, user_id: str | ObjectId, user_data: dict, projection: dict | None = None):
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
 
-        await self.collection.update_one(
+        user = await self.collection.find_one_and_update(
             {"_id": user_id},
             {"$set": user_data},
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
         )
-        return await self.get_user_by_id(user_id)
+        await invalidate_user_cache(user_id)
+        return user
     
 
-    async def update_user_role(self, user_id: str | ObjectId, new_role: UserRole):
+    async def update_user_role(self, user_id: str | ObjectId, new_role: UserRole, projection: dict | None = None):
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
 
-        await self.collection.update_one(
+        user = await self.collection.find_one_and_update(
             {"_id": user_id},
             {"$set": {"role": new_role.value}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
         )
-        return await self.get_user_by_id(user_id)
+        await invalidate_user_cache(user_id)
+        return user
     
 
     async def delete_user(self, user_id: str | ObjectId):
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
-        return await self.collection.delete_one({"_id": user_id})
+        result = await self.collection.delete_one({"_id": user_id})
+        await invalidate_user_cache(user_id)
+        return result
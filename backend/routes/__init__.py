@@ -6,6 +6,8 @@ from routes.products import router as products_router
 from routes.orders import router as orders_router
 from routes.auth import router as auth_router
 from routes.stats import router as stats_router
+from routes.reservations import router as reservations_router
+from routes.metrics import router as metrics_router
 
 
 
@@ -16,6 +18,8 @@ routers = [
     products_router,
     orders_router,
     stats_router,
+    reservations_router,
+    metrics_router,
 ]
 
 main_router = APIRouter()
@@ -7,6 +7,7 @@ from dependencies.dependency_injection import (
     AuthServiceDep,
 )
 from core.config import settings 
+from utils.rate_limit import client_ip, enforce_rate_limit
 
 
 
@@ -30,9 +31,13 @@ async def user_register(
 @router.post("/login", description="Login into account")
 async def user_login(
     user: UserLogin,
+    request: Request,
     response: Response,
     auth_service: AuthServiceDep,
 ):
+    # Throttle before the user lookup and the argon2 verify.
+    ip = client_ip(request)
+    await enforce_rate_limit("login", ip, user=f"{ip}|{user.email.lower()}")
     await auth_service.login(creds=user, response=response)
     return {"msg": "Login successful"}
 
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Query, HTTPException, status
 
 from dependencies.dependency_injection import CategoryServiceDep, AdminDep
+from utils.pagination import set_next_cursor
+from utils.serialization import fast_response
+from utils.projection import parse_fields, response_projection
 from models.category import CategoryCreate, CategoryResponse
 
 
@@ -23,8 +26,19 @@ async def get_all_categories(
     category_service: CategoryServiceDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, gt=0, le=100),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    fields: str | None = Query(None, description="Comma-separated list of response fields to return"),
 ):
-    return await category_service.get_all_categories(skip=skip, limit=limit)
+    selected = parse_fields(fields, CategoryResponse)
+    categories = await category_service.get_all_categories(
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        projection=response_projection(CategoryResponse, selected),
+    )
+    response = fast_response(list[CategoryResponse], categories, fields=selected)
+    set_next_cursor(response, categories, limit)
+    return response
 
 
 
@@ -2,6 +2,9 @@
 from fastapi import APIRouter, HTTPException, status, Query
 from pydantic import BaseModel
 
+from utils.pagination import set_next_cursor
+from utils.serialization import fast_response
+from utils.projection import parse_fields, response_projection
 from dependencies.dependency_injection import AdminDep, OrderServiceDep, CurrentUserDep
 from models.order import OrderCreate, OrderResponse, OrderItem, OrderStatusUpdate, QuantityUpdate
 from models.user import UserRole
@@ -20,14 +23,22 @@ async def get_my_orders(
     current_user: CurrentUserDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, gt=0, le=100),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
     status_filter: str | None = None,
+    fields: str | None = Query(None, description="Comma-separated list of response fields to return"),
 ):
-    return await order_service.get_orders(
+    selected = parse_fields(fields, OrderResponse)
+    orders = await order_service.get_orders(
         skip=skip,
         limit=limit,
         user_id=str(current_user.id),
         status_filter=status_filter,
+        cursor=cursor,
+        projection=response_projection(OrderResponse, selected),
     )
+    response = fast_response(list[OrderResponse], orders, fields=selected)
+    set_next_cursor(response, orders, limit)
+    return response
 
 
 
@@ -41,18 +52,26 @@ async def get_all_orders(
     current_user: CurrentUserDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, gt=0, le=100),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
     status_filter: str | None = None,
+    fields: str | None = Query(None, description="Comma-separated list of response fields to return"),
 ):
+    selected = parse_fields(fields, OrderResponse)
     user_id: str | None = None
     if current_user.role == UserRole.CUSTOMER:
         user_id = str(current_user.id)
 
-    return await order_service.get_orders(
+    orders = await order_service.get_orders(
         skip=skip,
         limit=limit,
         user_id=user_id,
         status_filter=status_filter,
+        cursor=cursor,
+        projection=response_projection(OrderResponse, selected),
     )
+    response = fast_response(list[OrderResponse], orders, fields=selected)
+    set_next_cursor(response, orders, limit)
+    return response
 
 
 
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Query, HTTPException, status
 
 
-from dependencies.dependency_injection import ProductServiceDep, AdminDep
-from models.product import ProductCreate, ProductResponse, ProductVariant
+from utils.pagination import set_next_cursor
+from utils.serialization import fast_response
+from utils.projection import parse_fields, response_projection
+from dependencies.dependency_injection import ProductServiceDep, ReservationServiceDep, AdminDep, rate_limited
+from models.product import ProductCreate, ProductResponse, ProductSuggestion, ProductVariant
+from models.reservation import VariantAvailability
 
 
 
@@ -18,18 +22,30 @@ router = APIRouter(prefix="/products", tags=["Products"])
     "/",
     response_model=list[ProductResponse],
     description="Get all products with optional filters",
+    dependencies=[rate_limited("products")],
 )
 async def get_all_products(
     product_service: ProductServiceDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, gt=0, le=100),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
     category_id: str | None = None,
     size: str | None = None,
     color: str | None = None,
     min_price: float | None = Query(None, ge=0),
     max_price: float | None = Query(None, ge=0),
+    in_stock_only: bool = Query(False, description="Only products (and variants) with stock > 0"),
+    q: str | None = Query(None, min_length=1, description="Full-text search over name and description"),
+    fields: str | None = Query(None, description="Comma-separated list of response fields to return"),
 ):
-    return await product_service.get_all_products(
+    if q and cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination is not supported with q; use skip",
+        )
+
+    selected = parse_fields(fields, ProductResponse)
+    products = await product_service.get_all_products(
         skip=skip,
         limit=limit,
         category_id=category_id,
@@ -37,7 +53,33 @@ async def get_all_products(
         color=color,
         min_price=min_price,
         max_price=max_price,
+        cursor=cursor,
+        projection=response_projection(ProductResponse, selected),
+        in_stock_only=in_stock_only,
+        q=q,
     )
+    response = fast_response(list[ProductResponse], products, fields=selected)
+    if not q:
+        set_next_cursor(response, products, limit)
+    return response
+
+
+
+
+
+@router.get(
+    "/suggest",
+    response_model=list[ProductSuggestion],
+    description="Typeahead suggestions by product name prefix",
+    dependencies=[rate_limited("products")],
+)
+async def suggest_products(
+    product_service: ProductServiceDep,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, gt=0, le=25),
+):
+    suggestions = await product_service.suggest_products(q=q, limit=limit)
+    return fast_response(list[ProductSuggestion], suggestions)
 
 
 
@@ -52,7 +94,23 @@ async def get_product_by_id(
     product_id: str,
     product_service: ProductServiceDep,
 ):
-    return await product_service.get_product_by_id(product_id=product_id)
+    product = await product_service.get_product_by_id(product_id=product_id)
+    return fast_response(ProductResponse, product)
+
+
+
+
+
+@router.get(
+    "/{product_id}/availability",
+    response_model=list[VariantAvailability],
+    description="Available-to-sell per variant (stock minus active cart holds)",
+)
+async def get_product_availability(
+    product_id: str,
+    reservation_service: ReservationServiceDep,
+):
+    return await reservation_service.get_availability(product_id=product_id)
 
 
 
@@ -111,6 +169,22 @@ async def delete_product(
 
 
 
+@router.patch(
+    "/{product_id}/stock-sharding",
+    response_model=ProductResponse,
+    description="Enable or disable sharded stock counters for a hot product (admin only)",
+)
+async def set_stock_sharding(
+    product_id: str,
+    product_service: ProductServiceDep,
+    admin: AdminDep,
+    enabled: bool = Query(..., description="Spread variant stock over counter slots"),
+):
+    return await product_service.set_stock_sharding(product_id=product_id, enabled=enabled)
+
+
+
+
 @router.post(
     "/{product_id}/variants",
     response_model=ProductResponse,
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, status
+
+from dependencies.dependency_injection import CurrentUserDep, ReservationServiceDep
+from models.reservation import ReservationCreate, ReservationResponse
+
+
+router = APIRouter(prefix="/reservations", tags=["Reservations"])
+
+
+
+
+@router.post(
+    "/",
+    status_code=status.HTTP_201_CREATED,
+    response_model=ReservationResponse,
+    description="Hold stock for cart items for a limited time",
+)
+async def create_reservation(
+    reservation: ReservationCreate,
+    reservation_service: ReservationServiceDep,
+    current_user: CurrentUserDep,
+):
+    return await reservation_service.reserve_items(
+        user_id=str(current_user.id),
+        items=reservation.items,
+    )
+
+
+
+
+@router.put(
+    "/{reservation_id}",
+    response_model=ReservationResponse,
+    description="Replace the held items and extend the hold",
+)
+async def update_reservation(
+    reservation_id: str,
+    reservation: ReservationCreate,
+    reservation_service: ReservationServiceDep,
+    current_user: CurrentUserDep,
+):
+    return await reservation_service.reserve_items(
+        user_id=str(current_user.id),
+        items=reservation.items,
+        reservation_id=reservation_id,
+    )
+
+
+
+
+@router.get(
+    "/{reservation_id}",
+    response_model=ReservationResponse,
+    description="Get a reservation",
+)
+async def get_reservation(
+    reservation_id: str,
+    reservation_service: ReservationServiceDep,
+    current_user: CurrentUserDep,
+):
+    return await reservation_service.get_reservation(
+        user_id=str(current_user.id),
+        reservation_id=reservation_id,
+    )
+
+
+
+
+@router.delete(
+    "/{reservation_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Release all holds of a reservation",
+)
+async def delete_reservation(
+    reservation_id: str,
+    reservation_service: ReservationServiceDep,
+    current_user: CurrentUserDep,
+):
+    await reservation_service.release_reservation(
+        user_id=str(current_user.id),
+        reservation_id=reservation_id,
+    )
+    return None
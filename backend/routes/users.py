@@ -2,6 +2,9 @@ from fastapi import APIRouter, HTTPException, status, Query
 
 from models.user import UserResponse, UserRole
 from dependencies.dependency_injection import UserServiceDep, CurrentUserDep, AdminDep
+from utils.pagination import set_next_cursor
+from utils.serialization import fast_response
+from utils.projection import parse_fields, response_projection
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -19,8 +22,19 @@ async def get_users(
     admin: AdminDep,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, gt=0, le=100),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    fields: str | None = Query(None, description="Comma-separated list of response fields to return"),
 ):
-    return await user_service.get_all_users(skip=skip, limit=limit)
+    selected = parse_fields(fields, UserResponse)
+    users = await user_service.get_all_users(
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        projection=response_projection(UserResponse, selected),
+    )
+    response = fast_response(list[UserResponse], users, fields=selected)
+    set_next_cursor(response, users, limit)
+    return response
 
 
 
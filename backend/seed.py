@@ -8,6 +8,7 @@ from faker import Faker
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from utils.password_hasher import hash_password
+from utils.product_query import name_prefixes
 
 fake = Faker("en_US")
 
@@ -213,6 +214,7 @@ async def clear_database(db):
     await db.users.delete_many({})
     await db.products.delete_many({})
     await db.orders.delete_many({})
+    await db.product_prefixes.delete_many({})
 
 
 async def seed_categories(db):
@@ -297,7 +299,7 @@ async def seed_products(db, category_ids, count=100):
     return result.inserted_ids
 
 
-async def seed_orders(db, user_ids, product_docs, count=100):
+async def seed_orders(db, user_ids, product_docs, category_names, count=100):
     docs = []
 
     customer_ids = user_ids[1:] if len(user_ids) > 1 else user_ids
@@ -325,6 +327,8 @@ async def seed_orders(db, user_ids, product_docs, count=100):
                     "price": price,
                     "quantity": qty,
                     "variant": {"size": v["size"], "color": v["color"]},
+                    "category_id": p["category_id"],
+                    "category_name": category_names.get(p["category_id"]),
                 }
             )
 
@@ -341,6 +345,16 @@ async def seed_orders(db, user_ids, product_docs, count=100):
     await db.orders.insert_many(docs)
 
 
+async def seed_product_prefixes(db, product_docs):
+    docs = [
+        {"_id": p["_id"], "name": p["name"], "prefixes": name_prefixes(p["name"])}
+        for p in product_docs
+        if p.get("name")
+    ]
+    if docs:
+        await db.product_prefixes.insert_many(docs)
+
+
 async def main():
     client = AsyncIOMotorClient(MONGO_URL)
     db = client[DB_NAME]
@@ -358,8 +372,12 @@ async def main():
     await seed_products(db, category_ids, PRODUCTS_COUNT)
     product_docs = await db.products.find().to_list(length=PRODUCTS_COUNT)
 
+    print("Indexing product name prefixes...")
+    await seed_product_prefixes(db, product_docs)
+
     print("Seeding orders...")
-    await seed_orders(db, user_ids, product_docs, ORDERS_COUNT)
+    category_names = dict(zip(category_ids, CATEGORY_POOL))
+    await seed_orders(db, user_ids, product_docs, category_names, ORDERS_COUNT)
 
     c1 = await db.categories.count_documents({})
     c2 = await db.users.count_documents({})
@@ -8,7 +8,7 @@ from core.config import settings
 from repositories.user_repo import UserRepository
 from utils.redis import get_redis
 from core.security import create_access_token, create_refresh_token
-from utils.password_hasher import verify_password
+from utils.hashing_pool import verify_password_async
 
 
 class AuthService:
@@ -28,7 +28,7 @@ class AuthService:
 
         try:
 
-            if not verify_password(creds.password, user_obj["passwordHash"]):
+            if not await verify_password_async(creds.password, user_obj["passwordHash"]):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Incorrect email or password",
@@ -1,5 +1,6 @@
 from utils.handler import validate_mongodb_id
 from repositories.category_repo import CategoryRepository
+from utils.category_snapshot import category_snapshot
 from models.category import CategoryCreate
 
 class CategoryService:
@@ -7,12 +8,23 @@ class CategoryService:
     def __init__(self, category_repo: CategoryRepository):
         self.category_repo = category_repo
 
-    async def get_all_categories(self, skip: int = 0, limit: int = 10):
-        return await self.category_repo.get_categories(skip=skip, limit=limit)
+    async def get_all_categories(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: str | None = None,
+        projection: dict | None = None,
+    ):
+        return await category_snapshot.page(
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+        )
 
     async def get_category_by_id(self, category_id: str):
         validate_mongodb_id(category_id)
-        return await self.category_repo.get_category_by_id(category_id)
+        return await category_snapshot.get(category_id)
 
     async def create_category(self, category_data: CategoryCreate):
         category_dict = category_data.dict()
@@ -4,9 +4,9 @@ from fastapi import HTTPException, status
 
 from utils.handler import validate_mongodb_id
 from models.order import OrderCreate, OrderStatus
-from repositories.order_repo import OrderRepository
-from repositories.product_repo import ProductRepository
+from repositories.order_repo import OrderRepository, InsufficientStockError
 from repositories.user_repo import UserRepository
+from services.reservation_service import ReservationService
 
 
 class OrderService:
@@ -14,12 +14,12 @@ class OrderService:
     def __init__(
         self,
         order_repo: OrderRepository,
-        product_repo: ProductRepository,
         user_repo: UserRepository,
+        reservation_service: ReservationService,
     ):
         self.order_repo = order_repo
-        self.product_repo = product_repo
         self.user_repo = user_repo
+        self.reservation_service = reservation_service
 
     async def get_orders(
         self,
@@ -27,6 +27,8 @@ class OrderService:
         limit: int = 10,
         user_id: str | None = None,
         status_filter: str | None = None,
+        cursor: str | None = None,
+        projection: dict | None = None,
     ):
 
         if user_id:
@@ -36,6 +38,8 @@ class OrderService:
             limit=limit,
             user_id=user_id,
             status=status_filter,
+            cursor=cursor,
+            projection=projection,
         )
 
 
@@ -57,39 +61,28 @@ class OrderService:
                 detail="User does not exist",
             )
 
-        for item in order_data.items:
-            product = await self.product_repo.get_product_by_id(str(item.product_id))
-            if product is None:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Product {item.product_id} does not exist",
-                )
-
-            matched_variant = None
-            for variant in product.get("variants", []):
-                if (
-                    variant["size"] == item.variant.size
-                    and variant["color"] == item.variant.color
-                ):
-                    matched_variant = variant
-                    break
-
-            if matched_variant is None:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"No such variant for product {item.product_id} "
-                           f"({item.variant.size}, {item.variant.color})",
-                )
-
-            if matched_variant["stock"] < item.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Insufficient stock for product {item.product_id} "
-                           f"({item.variant.size}, {item.variant.color})",
-                )
-
-
-        return await self.order_repo.create_order(current_user_id, order_data.items)
+        # Holds (an explicit cart reservation, or a short implicit one) make sure
+        # this checkout does not eat stock promised to other carts; the guarded
+        # bulk $inc in create_order remains the source of truth for stock.
+        reservation_id, held_variants = await self.reservation_service.hold_for_checkout(
+            current_user_id,
+            order_data.items,
+            reservation_id=order_data.reservation_id,
+        )
+
+        try:
+            order = await self.order_repo.create_order(current_user_id, order_data.items)
+        except InsufficientStockError as exc:
+            if order_data.reservation_id is None:
+                await self.reservation_service.release_holds(reservation_id, held_variants)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+        except Exception:
+            if order_data.reservation_id is None:
+                await self.reservation_service.release_holds(reservation_id, held_variants)
+            raise
+
+        await self.reservation_service.release_holds(reservation_id, held_variants)
+        return order
 
     async def update_order(self, order_id: str, order_data: dict):
         validate_mongodb_id(order_id)
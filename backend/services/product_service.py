@@ -1,16 +1,55 @@
+from bson import ObjectId
 from fastapi import HTTPException, status
 
+from core.config import settings
 from utils.handler import validate_mongodb_id
+from utils.redis import (
+    invalidate_product_cache,
+    get_from_redis,
+    update_redis,
+    product_cache_key,
+    product_listing_cache_key,
+    record_cache_lookup,
+)
 from models.product import ProductCreate, ProductVariant
 from repositories.product_repo import ProductRepository
-from repositories.category_repo import CategoryRepository
+from repositories.stock_counter_repo import StockCounterRepository
+from utils.category_snapshot import category_snapshot
 
 
 class ProductService:
 
-    def __init__(self, product_repo: ProductRepository, category_repo: CategoryRepository):
+    def __init__(
+        self,
+        product_repo: ProductRepository,
+        counter_repo: StockCounterRepository,
+    ):
         self.product_repo = product_repo
-        self.category_repo = category_repo
+        self.counter_repo = counter_repo
+
+    async def _with_unfolded_usage(self, products: list[dict]) -> list[dict]:
+        # Sharded (hot) variants have sold stock sitting in counter slots until
+        # the compactor folds it into variants.stock; subtract it on read so the
+        # cached documents don't have to be invalidated on every checkout.
+        usage = await self.counter_repo.unfolded_usage(
+            ObjectId(product["_id"]) for product in products if product.get("stock_sharded")
+        )
+        if not usage:
+            return products
+
+        adjusted = []
+        for product in products:
+            if product.get("stock_sharded") and "variants" in product:
+                product_id = ObjectId(product["_id"])
+                product = {
+                    **product,
+                    "variants": [
+                        {**v, "stock": v["stock"] - usage.get((product_id, v["size"], v["color"]), 0)}
+                        for v in product["variants"]
+                    ],
+                }
+            adjusted.append(product)
+        return adjusted
 
     async def get_all_products(
         self,
@@ -21,28 +60,58 @@ class ProductService:
         color: str | None = None,
         min_price: float | None = None,
         max_price: float | None = None,
+        cursor: str | None = None,
+        projection: dict | None = None,
+        in_stock_only: bool = False,
+        q: str | None = None,
     ):
-        return await self.product_repo.get_products(
-            skip=skip,
-            limit=limit,
-            category_id=category_id,
-            size=size,
-            color=color,
-            min_price=min_price,
-            max_price=max_price,
-        )
+        if projection is not None and "variants" in projection:
+            projection = {**projection, "stock_sharded": 1}
+
+        filters = {
+            "skip": skip,
+            "limit": limit,
+            "category_id": category_id,
+            "size": size,
+            "color": color,
+            "min_price": min_price,
+            "max_price": max_price,
+            "cursor": cursor,
+            "projection": projection,
+            "in_stock_only": in_stock_only,
+            "q": q,
+        }
+        key = await product_listing_cache_key(filters)
+
+        cached = await get_from_redis(key)
+        record_cache_lookup("product_list", hit=cached is not None)
+        if cached is None:
+            cached = await self.product_repo.get_products(**filters)
+            await update_redis(key, cached, ttl=settings.PRODUCT_LIST_CACHE_TTL)
+        return await self._with_unfolded_usage(cached)
+
+    async def suggest_products(self, q: str, limit: int = 10):
+        return await self.product_repo.suggest(q, limit=limit)
 
     async def get_product_by_id(self, product_id: str):
         validate_mongodb_id(product_id)
-        product = await self.product_repo.get_product_by_id(product_id)
-        if product is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-        return product
+        key = product_cache_key(product_id)
+
+        cached = await get_from_redis(key)
+        record_cache_lookup("product", hit=cached is not None)
+        if cached is None:
+            cached = await self.product_repo.get_product_by_id(product_id)
+            if cached is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+            await update_redis(key, cached, ttl=settings.PRODUCT_CACHE_TTL)
+
+        products = await self._with_unfolded_usage([cached])
+        return products[0]
 
     async def create_product(self, product_data: ProductCreate):
         product_dict = product_data.dict()
 
-        category = await self.category_repo.get_category_by_id(product_dict["category_id"])
+        category = await category_snapshot.get(product_dict["category_id"])
         if category is None:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid category ID")
 
@@ -58,6 +127,19 @@ class ProductService:
 
 
 
+    async def set_stock_sharding(self, product_id: str, enabled: bool):
+        validate_mongodb_id(product_id)
+        oid = ObjectId(product_id)
+        if enabled:
+            result = await self.counter_repo.enable(oid)
+        else:
+            result = await self.counter_repo.disable(oid)
+        if result is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+        await invalidate_product_cache(oid)
+        return await self.product_repo.get_product_by_id(oid)
+
     async def add_variant(self, product_id: str, variant: ProductVariant):
         validate_mongodb_id(product_id)
         return await self.product_repo.add_variant(product_id, variant)
@@ -0,0 +1,175 @@
+import uuid
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from utils.handler import validate_mongodb_id
+from utils.stock_reservations import (
+    ReservationConflictError,
+    ReservationOwnerError,
+    ReservationQuantityError,
+    active_holds,
+    get_reservation,
+    held_quantities,
+    parse_variant_id,
+    release,
+    reserve,
+    variant_id,
+)
+from repositories.product_repo import ProductRepository
+from repositories.stock_counter_repo import StockCounterRepository
+
+
+class ReservationService:
+
+    def __init__(self, product_repo: ProductRepository, counter_repo: StockCounterRepository):
+        self.product_repo = product_repo
+        self.counter_repo = counter_repo
+
+    async def _effective_stock(self, products: list[dict]) -> dict[str, int]:
+        # Sharded (hot) variants have taken stock sitting in counter slots
+        # until the compactor folds it into the product document.
+        usage = await self.counter_repo.unfolded_usage(
+            product["_id"] for product in products if product.get("stock_sharded")
+        )
+        return {
+            variant_id(product["_id"], variant["size"], variant["color"]):
+                variant["stock"] - usage.get((product["_id"], variant["size"], variant["color"]), 0)
+            for product in products
+            for variant in product.get("variants", [])
+        }
+
+    async def _stock_by_variant(self, items) -> dict[str, int]:
+        products = await self.product_repo.get_products_by_ids(
+            [item.product_id for item in items],
+            projection={"variants": 1, "stock_sharded": 1},
+        )
+        product_ids = {str(product["_id"]) for product in products}
+        stock = await self._effective_stock(products)
+
+        for item in items:
+            if str(item.product_id) not in product_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Product {item.product_id} does not exist",
+                )
+            if variant_id(item.product_id, item.variant.size, item.variant.color) not in stock:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"No such variant for product {item.product_id} "
+                           f"({item.variant.size}, {item.variant.color})",
+                )
+
+        return stock
+
+    async def _place_holds(self, reservation_id: str, user_id: str, quantities: dict[str, int], stock: dict[str, int], ttl: int):
+        lines = [(variant, qty, stock.get(variant, 0)) for variant, qty in quantities.items()]
+        try:
+            return await reserve(reservation_id, user_id, lines, ttl)
+        except ReservationOwnerError:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+        except ReservationQuantityError as exc:
+            product_id, size, color = parse_variant_id(exc.variant)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Quantity must be positive for product {product_id} ({size}, {color})",
+            )
+        except ReservationConflictError as exc:
+            product_id, size, color = parse_variant_id(exc.variant)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Insufficient stock for product {product_id} ({size}, {color})",
+            )
+
+    async def _get_owned(self, user_id: str, reservation_id: str) -> dict:
+        reservation = await get_reservation(reservation_id)
+        if reservation is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found")
+        if reservation["user"] != user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+        return reservation
+
+    @staticmethod
+    def _to_response(reservation_id: str, expires_at, lines: dict[str, int]) -> dict:
+        items = []
+        for variant, qty in lines.items():
+            product_id, size, color = parse_variant_id(variant)
+            items.append({"product_id": product_id, "variant": {"size": size, "color": color}, "quantity": qty})
+        return {"_id": reservation_id, "expires_at": expires_at, "items": items}
+
+    async def reserve_items(self, user_id: str, items, reservation_id: str | None = None):
+        quantities: dict[str, int] = defaultdict(int)
+        for item in items:
+            quantities[variant_id(item.product_id, item.variant.size, item.variant.color)] += item.quantity
+
+        if reservation_id is None:
+            reservation_id = uuid.uuid4().hex
+        else:
+            reservation = await self._get_owned(user_id, reservation_id)
+            for variant in reservation["lines"]:
+                quantities.setdefault(variant, 0)
+
+        stock = await self._stock_by_variant(items)
+        expires_at = await self._place_holds(
+            reservation_id, user_id, quantities, stock, settings.RESERVATION_TTL_SECONDS,
+        )
+        return self._to_response(
+            reservation_id,
+            expires_at,
+            {variant: qty for variant, qty in quantities.items() if qty > 0},
+        )
+
+    async def get_reservation(self, user_id: str, reservation_id: str):
+        reservation = await self._get_owned(user_id, reservation_id)
+        return self._to_response(reservation_id, reservation["expires_at"], reservation["lines"])
+
+    async def release_reservation(self, user_id: str, reservation_id: str):
+        reservation = await self._get_owned(user_id, reservation_id)
+        await release(reservation_id, reservation["lines"])
+
+    async def hold_for_checkout(self, user_id: str, items, reservation_id: str | None = None) -> tuple[str, list[str]]:
+        quantities: dict[str, int] = defaultdict(int)
+        for item in items:
+            quantities[variant_id(item.product_id, item.variant.size, item.variant.color)] += item.quantity
+
+        if reservation_id is not None:
+            reservation = await self._get_owned(user_id, reservation_id)
+            held = await active_holds(reservation_id, quantities)
+            for variant, qty in quantities.items():
+                if held.get(variant, 0) < qty:
+                    product_id, size, color = parse_variant_id(variant)
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"Reservation does not cover product {product_id} ({size}, {color})",
+                    )
+            return reservation_id, list(reservation["lines"])
+
+        reservation_id = uuid.uuid4().hex
+        stock = await self._stock_by_variant(items)
+        await self._place_holds(reservation_id, user_id, quantities, stock, settings.CHECKOUT_HOLD_TTL_SECONDS)
+        return reservation_id, list(quantities)
+
+    async def release_holds(self, reservation_id: str, variants: list[str]):
+        await release(reservation_id, variants)
+
+    async def get_availability(self, product_id: str):
+        validate_mongodb_id(product_id)
+        product = await self.product_repo.get_product_by_id(product_id)
+        if product is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+        variants = product.get("variants", [])
+        ids = [variant_id(product["_id"], v["size"], v["color"]) for v in variants]
+        stock = await self._effective_stock([product])
+        held = await held_quantities(ids)
+        return [
+            {
+                "size": v["size"],
+                "color": v["color"],
+                "stock": stock[vid],
+                "held": held[vid],
+                "available": max(stock[vid] - held[vid], 0),
+            }
+            for v, vid in zip(variants, ids)
+        ]
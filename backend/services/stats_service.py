@@ -0,0 +1,152 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable
+
+from core.config import settings
+from repositories.stats_repo import StatsRepository
+from utils.redis import (
+    get_many_from_redis,
+    update_many_redis,
+    get_stats_generations,
+    record_cache_lookup,
+)
+
+
+BucketLoader = Callable[[datetime, datetime], Awaitable[list]]
+
+
+
+
+def _next_month(day: datetime) -> datetime:
+    return datetime(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def month_buckets(start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+    buckets = []
+    month = datetime(start.year, start.month, 1)
+    while month < end:
+        next_month = _next_month(month)
+        buckets.append((max(start, month), min(end, next_month)))
+        month = next_month
+    return buckets
+
+
+def _today() -> datetime:
+    now = datetime.utcnow()
+    return datetime(now.year, now.month, now.day)
+
+
+
+
+class StatsService:
+
+    def __init__(self, stats_repo: StatsRepository):
+        self.stats_repo = stats_repo
+
+
+    async def _resolve_range(self, date_from: date | None, date_to: date | None):
+        if date_from is not None:
+            start = datetime(date_from.year, date_from.month, date_from.day)
+        else:
+            start = await self.stats_repo.first_day()
+
+        if date_to is not None:
+            end = datetime(date_to.year, date_to.month, date_to.day) + timedelta(days=1)
+        else:
+            end = _today() + timedelta(days=1)
+
+        return start, end
+
+
+    async def _load_buckets(
+        self,
+        kind: str,
+        loader: BucketLoader,
+        date_from: date | None,
+        date_to: date | None,
+    ) -> list[list[dict]]:
+        start, end = await self._resolve_range(date_from, date_to)
+        if start is None or start >= end:
+            return []
+
+        buckets = month_buckets(start, end)
+        generations = await get_stats_generations([b.strftime("%Y-%m") for b, _ in buckets])
+
+        today = _today()
+        keys = [
+            f"stats:{kind}:{generations[b.strftime('%Y-%m')]}:{b:%Y-%m-%d}:{e:%Y-%m-%d}"
+            if e <= today else None
+            for b, e in buckets
+        ]
+
+        cached = await get_many_from_redis([k for k in keys if k])
+        for key in keys:
+            if key:
+                record_cache_lookup("stats", hit=key in cached)
+
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        loaded = await asyncio.gather(*(loader(*buckets[i]) for i in missing))
+
+        results: list = [cached.get(key) for key in keys]
+        for i, data in zip(missing, loaded):
+            results[i] = data
+
+        await update_many_redis(
+            {keys[i]: results[i] for i in missing if keys[i]},
+            ttl=settings.STATS_BUCKET_CACHE_TTL,
+        )
+        return results
+
+
+    async def sales_by_category(self, date_from: date | None = None, date_to: date | None = None):
+        buckets = await self._load_buckets(
+            "category", self.stats_repo.category_totals, date_from, date_to,
+        )
+
+        totals: dict[str, dict] = {}
+        for bucket in buckets:
+            for row in bucket:
+                total = totals.setdefault(
+                    row["category_id"],
+                    {"category_id": row["category_id"], "total_revenue": 0, "total_items": 0},
+                )
+                total["total_revenue"] += row["total_revenue"]
+                total["total_items"] += row["total_items"]
+
+        names = await self.stats_repo.category_names(totals)
+        for category_id, total in totals.items():
+            total["category_name"] = names.get(category_id)
+
+        return sorted(totals.values(), key=lambda t: t["total_revenue"], reverse=True)
+
+
+    async def revenue_by_month(self, date_from: date | None = None, date_to: date | None = None):
+        buckets = await self._load_buckets(
+            "month", self.stats_repo.monthly_revenue, date_from, date_to,
+        )
+        rows = [row for bucket in buckets for row in bucket]
+        return sorted(rows, key=lambda r: (r["year"], r["month"]))
+
+
+    async def top_products(self, limit: int = 10, date_from: date | None = None, date_to: date | None = None):
+        buckets = await self._load_buckets(
+            "product", self.stats_repo.product_totals, date_from, date_to,
+        )
+
+        totals: dict[str, dict] = {}
+        for bucket in buckets:
+            for row in bucket:
+                total = totals.setdefault(
+                    row["product_id"],
+                    {"product_id": row["product_id"], "total_quantity": 0, "total_revenue": 0},
+                )
+                total["total_quantity"] += row["total_quantity"]
+                total["total_revenue"] += row["total_revenue"]
+
+        top = sorted(totals.values(), key=lambda t: t["total_quantity"], reverse=True)[:limit]
+
+        names = await self.stats_repo.product_names(t["product_id"] for t in top)
+        for total in top:
+            total["name"] = names.get(total["product_id"])
+
+        return top
@@ -1,8 +1,10 @@
 from fastapi import HTTPException, status
 
 from utils.handler import validate_mongodb_id
-from models.user import UserRole, UserCreate
-from utils.password_hasher import hash_password 
+from models.user import UserRole, UserCreate, UserResponse
+from utils.hashing_pool import hash_password_async
+from utils.redis import record_cache_lookup
+from utils.user_cache import local_user_cache, get_cached_user, cache_user
 from repositories.user_repo import UserRepository
 
 
@@ -11,13 +13,46 @@ class UserService:
     def __init__(self, user_repo: UserRepository):
         self.user_repo = user_repo
 
-    async def get_all_users(self, skip: int = 0, limit: int = 10):
-        return await self.user_repo.get_users(skip=skip, limit=limit)
+    async def get_all_users(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: str | None = None,
+        projection: dict | None = None,
+    ):
+        return await self.user_repo.get_users(
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+        )
 
     async def get_user_by_id(self, user_id: str):
         validate_mongodb_id(user_id)
         return await self.user_repo.get_user_by_id(user_id)
 
+    async def get_authenticated_user(self, user_id: str) -> UserResponse | None:
+        user = local_user_cache.get(user_id)
+        if user is not None:
+            record_cache_lookup("user_local", hit=True)
+            return user
+        record_cache_lookup("user_local", hit=False)
+
+        cached, generation = await get_cached_user(user_id)
+        record_cache_lookup("user", hit=cached is not None)
+
+        if cached is None:
+            validate_mongodb_id(user_id)
+            cached = await self.user_repo.get_user_by_id(user_id)
+            if cached is None:
+                return None
+            cached.pop("passwordHash", None)
+            await cache_user(user_id, cached, generation)
+
+        user = UserResponse(**cached)
+        local_user_cache.set(user_id, user)
+        return user
+
     async def get_users_by_role(self, role: str, skip: int = 0, limit: int = 20):
         return await self.user_repo.get_users_by_role(role, skip=skip, limit=limit)
 
@@ -32,7 +67,7 @@ class UserService:
                 detail="User with this email already exists",
             )
 
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await hash_password_async(user_data.password)
         user_dict = user_data.dict()
 
         user_dict["passwordHash"] = hashed_password
@@ -45,7 +80,7 @@ class UserService:
         validate_mongodb_id(user_id)
 
         if "password" in user_data:
-            user_data["passwordHash"] = hash_password(user_data["password"])
+            user_data["passwordHash"] = await hash_password_async(user_data["password"])
             del user_data["password"]
 
         return await self.user_repo.update_user(user_id, user_data)
@@ -70,7 +105,7 @@ class UserService:
             "name": "Initial Admin",
             "email": admin_email,
             "address": "Admin address",
-            "passwordHash": hash_password("adminpass"),
+            "passwordHash": await hash_password_async("adminpass"),
             "role": UserRole.ADMIN.value,
         }
 
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+
+from bson import ObjectId
+
+from db import categories_collection
+from utils.pagination import KEYSET_SORT, decode_cursor
+from utils.redis import redis
+
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_CHANNEL = "categories:changed"
+
+
+
+
+class CategorySnapshot:
+
+    def __init__(self):
+        self._ordered: list[dict] = []
+        self._by_id: dict[ObjectId, dict] = {}
+        self._version = 0
+        self.loaded = False
+
+
+    async def refresh(self):
+        self._version += 1
+        version = self._version
+
+        docs = await categories_collection.find().sort(KEYSET_SORT).to_list(length=None)
+        if version != self._version:
+            return
+
+        self._ordered = docs
+        self._by_id = {doc["_id"]: doc for doc in docs}
+        self.loaded = True
+
+
+    async def _ensure_loaded(self):
+        if not self.loaded:
+            await self.refresh()
+
+
+    async def get(self, category_id: str | ObjectId) -> dict | None:
+        await self._ensure_loaded()
+        if isinstance(category_id, str):
+            category_id = ObjectId(category_id)
+        doc = self._by_id.get(category_id)
+        return dict(doc) if doc is not None else None
+
+
+    async def page(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: str | None = None,
+        projection: dict | None = None,
+    ) -> list[dict]:
+        await self._ensure_loaded()
+        docs = self._ordered
+
+        if cursor:
+            created_at, doc_id = decode_cursor(cursor)
+            docs = [d for d in docs if (d["created_at"], d["_id"]) < (created_at, doc_id)]
+        else:
+            docs = docs[skip:]
+
+        docs = docs[:limit]
+        if projection is None:
+            return [dict(d) for d in docs]
+        return [{k: d[k] for k in ("_id", *projection) if k in d} for d in docs]
+
+
+    async def listen(self):
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(CATEGORY_CHANNEL)
+                await self.refresh()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("category snapshot listener failed, resubscribing")
+                self.loaded = False
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+
+
+category_snapshot = CategorySnapshot()
+
+
+async def publish_category_change():
+    await category_snapshot.refresh()
+    await redis.publish(CATEGORY_CHANNEL, "1")
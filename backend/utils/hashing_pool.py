@@ -0,0 +1,42 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from utils.metrics import password_hash_pending, password_hash_rejected
+from utils.password_hasher import hash_password, verify_password
+
+
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="argon2",
+)
+_slots = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+
+async def _run_in_pool(func, *args):
+    if _slots.locked():
+        password_hash_rejected.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent password operations, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+    async with _slots:
+        password_hash_pending.inc()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+        finally:
+            password_hash_pending.inc(-1)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_pool(hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_in_pool(verify_password, plain, hashed)
@@ -0,0 +1,53 @@
+import time
+
+from utils.metrics import Counter, Gauge, Histogram
+
+
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+)
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+)
+http_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+
+
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - start, method=method, route=template)
+            http_requests.inc(method=method, route=template, status=str(status_code))
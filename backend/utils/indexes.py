@@ -1,10 +1,61 @@
-from pymongo import ASCENDING, DESCENDING
+import logging
+from itertools import combinations
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+from core.config import settings
 from db import (
     users_collection,
     categories_collection,
     products_collection,
     orders_collection,
+    product_prefixes_collection,
+    stock_counters_collection,
+    order_events_collection,
+    sales_daily_collection,
+    sales_category_daily_collection,
+    sales_product_daily_collection,
 )
+from utils.pagination import KEYSET_SORT
+from utils.product_query import build_product_query
+
+
+logger = logging.getLogger(__name__)
+
+
+# get_products filters by equality on any subset of these fields, sorts by
+# (created_at, _id) and optionally applies a price range, so every subset gets
+# an Equality-Sort-Range index.
+PRODUCT_EQUALITY_FIELDS = {
+    "category_id": "category",
+    "variants.size": "size",
+    "variants.color": "color",
+}
+
+PRODUCT_SAMPLE_FILTERS = {
+    "category_id": str(ObjectId()),
+    "variants.size": "M",
+    "variants.color": "Black",
+}
+
+# Superseded by the ESR indexes below, which start with the same keys; kept
+# only as names to drop from existing deployments.
+REDUNDANT_PRODUCT_INDEXES = ["products_category_idx", "products_variants_size_color_idx"]
+
+
+def _product_equality_shapes():
+    fields = list(PRODUCT_EQUALITY_FIELDS)
+    for r in range(len(fields) + 1):
+        yield from combinations(fields, r)
+
+
+def product_query_indexes():
+    for shape in _product_equality_shapes():
+        keys = [(field, ASCENDING) for field in shape]
+        keys += [("created_at", DESCENDING), ("_id", DESCENDING), ("price", ASCENDING)]
+        label = "_".join(PRODUCT_EQUALITY_FIELDS[field] for field in shape) or "all"
+        yield f"products_{label}_esr_idx", keys
 
 
 async def create_indexes():
@@ -21,6 +72,11 @@ async def create_indexes():
         name="users_role_idx",
     )
 
+    await users_collection.create_index(
+        [("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="users_created_at_id_idx",
+    )
+
     # CATEGORIES
     await categories_collection.create_index(
         [("name", ASCENDING)],
@@ -28,23 +84,47 @@ async def create_indexes():
         name="categories_name_unique",
     )
 
-    # PRODUCTS
-    await products_collection.create_index(
-        [("category_id", ASCENDING)],
-        name="products_category_idx",
+    await categories_collection.create_index(
+        [("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="categories_created_at_id_idx",
     )
 
+    # PRODUCTS
+    for name in REDUNDANT_PRODUCT_INDEXES:
+        try:
+            await products_collection.drop_index(name)
+        except OperationFailure:
+            pass
+
     await products_collection.create_index(
         [("price", ASCENDING)],
         name="products_price_idx",
     )
 
+    for name, keys in product_query_indexes():
+        await products_collection.create_index(keys, name=name)
+
     await products_collection.create_index(
-        [
-            ("variants.size", ASCENDING),
-            ("variants.color", ASCENDING),
-        ],
-        name="products_variants_size_color_idx",
+        [("name", TEXT), ("description", TEXT)],
+        weights={"name": 10, "description": 1},
+        name="products_text_idx",
+    )
+
+    await product_prefixes_collection.create_index(
+        [("prefixes", ASCENDING), ("name", ASCENDING)],
+        name="product_prefixes_prefix_name_idx",
+    )
+
+    await products_collection.create_index(
+        [("stock_sharded", ASCENDING)],
+        sparse=True,
+        name="products_stock_sharded_idx",
+    )
+
+    await stock_counters_collection.create_index(
+        [("product_id", ASCENDING), ("size", ASCENDING), ("color", ASCENDING), ("slot", ASCENDING)],
+        unique=True,
+        name="stock_counters_variant_slot_unique",
     )
 
     # ORDERS
@@ -63,3 +143,100 @@ async def create_indexes():
         name="orders_created_at_idx",
     )
 
+    await orders_collection.create_index(
+        [("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="orders_created_at_id_idx",
+    )
+
+    await orders_collection.create_index(
+        [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="orders_user_created_at_id_idx",
+    )
+
+    await orders_collection.create_index(
+        [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="orders_status_created_at_id_idx",
+    )
+
+    # ORDER EVENTS (outbox)
+    await order_events_collection.create_index(
+        [("status", ASCENDING), ("available_at", ASCENDING)],
+        name="order_events_status_available_at_idx",
+    )
+
+    await order_events_collection.create_index(
+        [("lease", ASCENDING)],
+        sparse=True,
+        name="order_events_lease_idx",
+    )
+
+    await order_events_collection.create_index(
+        [("processed_at", ASCENDING)],
+        expireAfterSeconds=settings.OUTBOX_RETENTION_SECONDS,
+        name="order_events_processed_at_ttl",
+    )
+
+    # SALES ROLLUPS
+    await sales_daily_collection.create_index(
+        [("day", ASCENDING)],
+        unique=True,
+        name="sales_daily_day_unique",
+    )
+
+    await sales_category_daily_collection.create_index(
+        [("day", ASCENDING), ("category_id", ASCENDING)],
+        unique=True,
+        name="sales_category_daily_day_category_unique",
+    )
+
+    await sales_product_daily_collection.create_index(
+        [("day", ASCENDING), ("product_id", ASCENDING)],
+        unique=True,
+        name="sales_product_daily_day_product_unique",
+    )
+
+
+
+
+def _plan_stages(plan) -> set[str]:
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages |= _plan_stages(value)
+    return stages
+
+
+async def report_product_query_plans() -> list[dict]:
+    report = []
+
+    for shape in _product_equality_shapes():
+        for with_price in (False, True):
+            query, _ = build_product_query(
+                category_id=PRODUCT_SAMPLE_FILTERS["category_id"] if "category_id" in shape else None,
+                size=PRODUCT_SAMPLE_FILTERS["variants.size"] if "variants.size" in shape else None,
+                color=PRODUCT_SAMPLE_FILTERS["variants.color"] if "variants.color" in shape else None,
+                min_price=0 if with_price else None,
+                max_price=1000 if with_price else None,
+            )
+
+            explain = await products_collection.find(query).sort(KEYSET_SORT).limit(10).explain()
+            winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+            stages = _plan_stages(winning_plan)
+            flagged = sorted(stages & {"COLLSCAN", "SORT"})
+
+            entry = {
+                "shape": list(shape) + (["price"] if with_price else []),
+                "stages": sorted(stages),
+                "flagged": flagged,
+            }
+            report.append(entry)
+
+            if flagged:
+                logger.warning("products query %s falls back to %s", entry["shape"], ", ".join(flagged))
+
+    return report
@@ -0,0 +1,208 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+
+
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+registry: list["Metric"] = []
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        registry.append(self)
+
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        raise NotImplementedError
+
+
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: dict[tuple, float] = {}
+
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, callback: Callable[[], float] | None = None):
+        super().__init__(name, description)
+        self._values: dict[tuple, float] = {}
+        self._callback = callback
+
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+    def samples(self):
+        if self._callback is not None:
+            return [(self.name, (), float(self._callback()))]
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}
+
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    out.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+                out.append((f"{self.name}_sum", key, total))
+                out.append((f"{self.name}_count", key, count))
+        return out
+
+
+
+
+class Collector(Metric):
+
+    def __init__(self, name: str, description: str, kind: str, callback: Callable[[], Iterable[tuple]]):
+        super().__init__(name, description)
+        self.kind = kind
+        self._callback = callback
+
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self._callback()]
+
+
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{rendered}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+
+
+password_hash_pending = Gauge(
+    "password_hash_pending",
+    "Password hash/verify operations queued or running in the argon2 pool",
+)
+password_hash_rejected = Counter(
+    "password_hash_rejected_total",
+    "Password operations rejected with 503 because the argon2 pool queue was full",
+)
+password_hash_pending.set(0)
+password_hash_rejected.inc(0)
+
+
+repository_duration = Histogram(
+    "repository_operation_duration_seconds",
+    "Repository method latency, including every Mongo round trip it makes",
+)
+repository_operations = Counter(
+    "repository_operations_total",
+    "Repository method calls by outcome",
+)
+
+
+def _timed(repository: str, method: str, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            repository_duration.observe(time.perf_counter() - start, repository=repository, method=method)
+            repository_operations.inc(repository=repository, method=method, outcome=outcome)
+
+    return wrapper
+
+
+def instrument_repository(cls):
+    for name, func in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(func):
+            setattr(cls, name, _timed(cls.__name__, name, func))
+    return cls
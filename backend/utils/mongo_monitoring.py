@@ -0,0 +1,86 @@
+from pymongo import monitoring
+
+from utils.metrics import Counter, Gauge, Histogram
+
+
+
+
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by command name",
+)
+mongo_command_failures = Counter(
+    "mongo_command_failures_total",
+    "MongoDB commands that returned an error",
+)
+mongo_pool_checkout_wait = Histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the MongoDB pool",
+)
+mongo_pool_checkout_failures = Counter(
+    "mongo_pool_checkout_failures_total",
+    "Failed MongoDB pool checkouts by reason",
+)
+mongo_pool_in_use = Gauge(
+    "mongo_pool_connections_in_use",
+    "MongoDB connections currently checked out",
+)
+mongo_pool_open = Gauge(
+    "mongo_pool_connections_open",
+    "MongoDB connections currently open",
+)
+
+
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, command=event.command_name)
+        mongo_command_failures.inc(command=event.command_name)
+
+
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_pool_open.inc(address=str(event.address))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_open.dec(address=str(event.address))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_checkout_wait.observe(event.duration)
+        mongo_pool_checkout_failures.inc(reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        mongo_pool_checkout_wait.observe(event.duration)
+        mongo_pool_in_use.inc(address=str(event.address))
+
+    def connection_checked_in(self, event):
+        mongo_pool_in_use.dec(address=str(event.address))
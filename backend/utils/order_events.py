@@ -0,0 +1,207 @@
+import asyncio
+import logging
+from bson import ObjectId
+from datetime import datetime
+from typing import Any, Dict, List
+
+from core.config import settings
+from db import client, products_collection
+from repositories.outbox_repo import OutboxRepository, outbox_wakeup
+from repositories.stats_repo import STATS_LOCK, StatsRepository
+from utils.metrics import Counter, Histogram
+from utils.redis import (
+    redis,
+    redis_lock,
+    invalidate_product_cache,
+    bump_product_listing_generation,
+    bump_stats_generation,
+)
+from utils.serialization import dumps
+
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_CHANNEL = "orders:events"
+
+# Only these events change product stock, so only they invalidate product caches.
+STOCK_EVENTS = {"order.created", "order.canceled"}
+
+# How long events wait before the next try when a handler is blocked by a lock.
+BUSY_RETRY_SECONDS = 5
+
+outbox_deliveries = Counter(
+    "outbox_deliveries_total",
+    "Order events delivered to each outbox handler, by result",
+)
+outbox_delivery_lag = Histogram(
+    "outbox_delivery_lag_seconds",
+    "Time from writing an order event to finishing all of its handlers",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+
+
+
+class HandlerBusyError(Exception):
+    pass
+
+
+
+
+async def invalidate_order_products(items: List[Dict[str, Any]]):
+    product_ids = list({ObjectId(item["product_id"]) for item in items})
+    if not product_ids:
+        return
+
+    await invalidate_product_cache(*product_ids)
+    category_ids = [item["category_id"] for item in items if item.get("category_id")]
+    if len(category_ids) < len(items):
+        category_ids += await products_collection.distinct("category_id", {"_id": {"$in": product_ids}})
+    await bump_product_listing_generation(*category_ids)
+
+
+def _order(event: dict) -> dict:
+    return event["after"] if event["after"] is not None else event["before"]
+
+
+
+
+async def invalidate_caches(events: List[dict], outbox: OutboxRepository | None):
+    items = [
+        item
+        for event in events if event["type"] in STOCK_EVENTS
+        for item in _order(event).get("items", [])
+    ]
+    await invalidate_order_products(items)
+
+
+async def update_stats(events: List[dict], outbox: OutboxRepository):
+    # Rollups are $inc deltas, so a redelivered event must not be applied twice:
+    # the delta and the handled marker commit together. Events are only written
+    # when MONGO_TRANSACTIONS is on (see deliver_inline otherwise).
+    stats = StatsRepository()
+    async with redis_lock(STATS_LOCK, ttl_ms=settings.OUTBOX_LEASE_SECONDS * 1000) as acquired:
+        if not acquired:
+            raise HandlerBusyError("stats rollups are locked")
+
+        for event in events:
+            # A rebuild may have marked the event handled since it was claimed.
+            async def apply(session, event=event):
+                if not await outbox.take_handler(event["_id"], "stats", session=session):
+                    return set()
+                return await stats.apply_order_change(event["before"], event["after"], session=session)
+
+            async with await client.start_session() as session:
+                months = await session.with_transaction(apply)
+            await bump_stats_generation(*months)
+            event["handled"].append("stats")
+
+
+async def publish_notifications(events: List[dict], outbox: OutboxRepository | None):
+    pipe = redis.pipeline(transaction=False)
+    for event in events:
+        order = _order(event)
+        pipe.publish(ORDER_EVENTS_CHANNEL, dumps({
+            "event_id": event["_id"],
+            "type": event["type"],
+            "order_id": event["order_id"],
+            "user_id": order.get("user_id"),
+            "status": order.get("status"),
+            "total": order.get("total"),
+        }))
+    await pipe.execute()
+
+
+async def deliver_inline(event_type: str, before: dict | None, after: dict | None):
+    # Without transactions the order write and an outbox insert cannot commit
+    # together, so side effects run right after the write instead. The order is
+    # already stored, so failures are logged rather than failing the request;
+    # rebuild_stats.py repairs rollups that missed a change.
+    event = {
+        "_id": ObjectId(),
+        "type": event_type,
+        "order_id": (after if after is not None else before)["_id"],
+        "before": before,
+        "after": after,
+    }
+    for name, deliver in (
+        ("cache", lambda: invalidate_caches([event], None)),
+        ("stats", lambda: StatsRepository().apply_order_change(before, after)),
+        ("notifications", lambda: publish_notifications([event], None)),
+    ):
+        try:
+            await deliver()
+            outbox_deliveries.inc(handler=name, result="ok")
+        except Exception:
+            logger.exception("inline order event handler %s failed for order %s", name, event["order_id"])
+            outbox_deliveries.inc(handler=name, result="error")
+
+
+HANDLERS = [
+    ("cache", invalidate_caches),
+    ("stats", update_stats),
+    ("notifications", publish_notifications),
+]
+
+
+
+
+async def process_outbox_batch(outbox: OutboxRepository) -> int:
+    events = await outbox.claim_batch(settings.OUTBOX_BATCH_SIZE)
+    if not events:
+        return 0
+
+    failed: set[ObjectId] = set()
+    for name, handler in HANDLERS:
+        pending = [event for event in events if name not in event["handled"]]
+        if not pending:
+            continue
+        try:
+            await handler(pending, outbox)
+        except HandlerBusyError:
+            # Lock contention (e.g. a stats rebuild) is not a delivery failure
+            # and must not use up attempts.
+            outbox_deliveries.inc(len(pending), handler=name, result="busy")
+            continue
+        except Exception:
+            logger.exception("outbox handler %s failed", name)
+            outbox_deliveries.inc(len(pending), handler=name, result="error")
+            failed.update(event["_id"] for event in pending)
+            continue
+
+        await outbox.mark_handled([event["_id"] for event in pending], name)
+        for event in pending:
+            if name not in event["handled"]:
+                event["handled"].append(name)
+        outbox_deliveries.inc(len(pending), handler=name, result="ok")
+
+    names = {name for name, _ in HANDLERS}
+    done = [event for event in events if names.issubset(event["handled"])]
+    await outbox.complete([event["_id"] for event in done])
+    unfinished = [event for event in events if not names.issubset(event["handled"])]
+    await outbox.retry_later([event for event in unfinished if event["_id"] in failed])
+    await outbox.defer([event["_id"] for event in unfinished if event["_id"] not in failed], BUSY_RETRY_SECONDS)
+
+    now = datetime.utcnow()
+    for event in done:
+        outbox_delivery_lag.observe((now - event["created_at"]).total_seconds())
+    return len(events)
+
+
+async def run_outbox_worker(interval: float):
+    outbox = OutboxRepository()
+    while True:
+        processed = 0
+        try:
+            processed = await process_outbox_batch(outbox)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("outbox batch failed")
+
+        if processed < settings.OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(outbox_wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            outbox_wakeup.clear()
@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc["created_at"]
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = f"{created_at}|{str(doc['_id'])}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, doc_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def apply_keyset(query: dict, cursor: str | None) -> dict:
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": doc_id}},
+        ]
+    return query
+
+
+def set_next_cursor(response: Response, docs: list, limit: int):
+    if docs and len(docs) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1])
@@ -0,0 +1,88 @@
+import re
+from bson import ObjectId
+from typing import Optional
+
+from utils.pagination import KEYSET_SORT
+
+
+
+
+PREFIX_MAX_LENGTH = 20
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def name_prefixes(name: str) -> list[str]:
+    prefixes = set()
+    for word in _words(name):
+        word = word[:PREFIX_MAX_LENGTH]
+        prefixes.update(word[:i] for i in range(1, len(word) + 1))
+    return sorted(prefixes)
+
+
+def prefix_terms(q: str) -> list[str]:
+    return [word[:PREFIX_MAX_LENGTH] for word in _words(q)]
+
+
+def product_sort(q: Optional[str] = None) -> list:
+    if q:
+        return [("score", {"$meta": "textScore"})] + KEYSET_SORT
+    return KEYSET_SORT
+
+
+def build_product_query(
+    category_id: Optional[str] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock_only: bool = False,
+    q: Optional[str] = None,
+) -> tuple[dict, dict]:
+    query: dict = {}
+
+    if q:
+        query["$text"] = {"$search": q}
+
+    if category_id:
+        query["category_id"] = ObjectId(category_id)
+
+    variant_filter = {}
+    if size:
+        variant_filter["size"] = size
+    if color:
+        variant_filter["color"] = color
+    if in_stock_only:
+        variant_filter["stock"] = {"$gt": 0}
+
+    if variant_filter:
+        query["variants"] = {"$elemMatch": variant_filter}
+
+    if min_price is not None or max_price is not None:
+        price_filter = {}
+        if min_price is not None:
+            price_filter["$gte"] = min_price
+        if max_price is not None:
+            price_filter["$lte"] = max_price
+        query["price"] = price_filter
+
+    return query, variant_filter
+
+
+def variant_filter_expression(variant_filter: dict) -> dict:
+    conditions = []
+    for field, value in variant_filter.items():
+        if isinstance(value, dict):
+            conditions.extend({op: [f"$$v.{field}", operand]} for op, operand in value.items())
+        else:
+            conditions.append({"$eq": [f"$$v.{field}", value]})
+
+    return {
+        "$filter": {
+            "input": {"$ifNull": ["$variants", []]},
+            "as": "v",
+            "cond": {"$and": conditions},
+        }
+    }
@@ -0,0 +1,44 @@
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+from utils.pagination import KEYSET_SORT
+
+
+
+
+def _field_aliases(model: type[BaseModel]) -> dict[str, str]:
+    aliases = {}
+    for name, field in model.model_fields.items():
+        alias = field.alias or name
+        aliases[name] = alias
+        aliases[alias] = alias
+    return aliases
+
+
+def parse_fields(fields: str | None, model: type[BaseModel]) -> tuple[str, ...] | None:
+    if not fields:
+        return None
+
+    aliases = _field_aliases(model)
+    selected = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in aliases:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field '{field}'",
+            )
+        if aliases[field] not in selected:
+            selected.append(aliases[field])
+
+    return tuple(selected) or None
+
+
+def response_projection(model: type[BaseModel], fields: tuple[str, ...] | None = None) -> dict:
+    aliases = dict.fromkeys(_field_aliases(model).values())
+    projection = {alias: 1 for alias in (fields or aliases)}
+    for field, _ in KEYSET_SORT:
+        projection[field] = 1
+    return projection
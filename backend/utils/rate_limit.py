@@ -0,0 +1,191 @@
+import ipaddress
+import logging
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+
+from core.config import settings
+from utils.lru import TTLCache
+from utils.metrics import Counter
+from utils.redis import redis
+
+
+logger = logging.getLogger(__name__)
+
+rate_limit_decisions = Counter(
+    "rate_limit_decisions_total",
+    "Rate limiter decisions by policy and result",
+)
+
+
+# Token buckets: a bucket holds up to `capacity` tokens and refills at `rate`
+# tokens per millisecond. All buckets of one request are checked first and only
+# consumed if every one of them has a token, so a request rejected by its user
+# bucket does not also drain the IP bucket. Time comes from Redis so all
+# workers refill at the same pace.
+TOKEN_BUCKET_SCRIPT = redis.register_script("""
+-- KEYS: one bucket per limit; ARGV: (capacity, rate per ms) per bucket
+-- Returns {allowed, then per bucket the ms until it has a token (0 if it has one)}
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local tokens = {}
+local result = {1}
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[i * 2 - 1]), tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(now - ts, 0) * rate)
+    tokens[i] = level
+    result[i + 1] = 0
+    if level < 1 then
+        result[1] = 0
+        result[i + 1] = math.ceil((1 - level) / rate)
+    end
+end
+
+if result[1] == 0 then
+    return result
+end
+
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[i * 2 - 1]), tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+end
+return result
+""")
+
+
+
+
+class RateLimitPolicy:
+
+    def __init__(self, name: str, per_ip: int | None = None, per_user: int | None = None, window: float = 60):
+        self.name = name
+        self.per_ip = per_ip
+        self.per_user = per_user
+        self.window = window
+
+
+    def buckets(self, ip: str | None, user: str | None) -> list[tuple[str, int, float]]:
+        buckets = []
+        if self.per_ip and ip:
+            buckets.append((f"ratelimit:{self.name}:ip:{ip}", self.per_ip, self.per_ip / (self.window * 1000)))
+        if self.per_user and user:
+            buckets.append((f"ratelimit:{self.name}:user:{user}", self.per_user, self.per_user / (self.window * 1000)))
+        return buckets
+
+
+
+
+POLICIES = {
+    # Login is limited per IP, and more strictly per (IP, submitted email).
+    # The strict bucket is not keyed on the email alone: attempts happen before
+    # authentication, so anyone could otherwise lock a victim out of login.
+    "login": RateLimitPolicy(
+        "login",
+        per_ip=settings.RATE_LIMIT_LOGIN_PER_IP,
+        per_user=settings.RATE_LIMIT_LOGIN_PER_IP_ACCOUNT,
+    ),
+    "products": RateLimitPolicy(
+        "products",
+        per_ip=settings.RATE_LIMIT_PRODUCTS_PER_IP,
+        per_user=settings.RATE_LIMIT_PRODUCTS_PER_USER,
+    ),
+    "stats": RateLimitPolicy(
+        "stats",
+        per_ip=settings.RATE_LIMIT_STATS_PER_IP,
+        per_user=settings.RATE_LIMIT_STATS_PER_USER,
+    ),
+}
+
+
+# Local fast path: once Redis reports a bucket empty, this process rejects
+# requests on it until it has refilled (monotonic deadline), without another
+# round trip. A burst from one client then costs a dict lookup per request
+# instead of a Redis call.
+blocked_until = TTLCache(maxsize=settings.RATE_LIMIT_LOCAL_CACHE_SIZE, ttl=60)
+
+
+
+
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in settings.RATE_LIMIT_TRUSTED_PROXIES.split(",") if proxy.strip()
+]
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str | None:
+    host = request.client.host if request.client else None
+    if host is None or not _is_trusted_proxy(host):
+        return host
+
+    # Each proxy appends the address it received the request from, so the
+    # client is the last hop not added by one of our own proxies. Entries
+    # further left are supplied by the client and cannot be trusted.
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",") if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else host
+
+
+def _too_many_requests(retry_after_ms: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(max(math.ceil(retry_after_ms / 1000), 1))},
+    )
+
+
+async def enforce_rate_limit(policy_name: str, ip: str | None, user: str | None = None):
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+
+    policy = POLICIES[policy_name]
+    buckets = policy.buckets(ip, user)
+    if not buckets:
+        return
+
+    keys = [key for key, _, _ in buckets]
+    deadline = max(blocked_until.get(key, 0) for key in keys)
+    if deadline:
+        rate_limit_decisions.inc(policy=policy_name, result="rejected_local")
+        raise _too_many_requests((deadline - time.monotonic()) * 1000)
+
+    args = []
+    for _, capacity, rate in buckets:
+        args += [capacity, rate]
+    try:
+        allowed, *waits = await TOKEN_BUCKET_SCRIPT(keys=keys, args=args)
+    except Exception:
+        # Fail open: losing admission control beats rejecting every request
+        # while Redis is unavailable.
+        logger.exception("rate limiter unavailable for policy %s", policy_name)
+        rate_limit_decisions.inc(policy=policy_name, result="error")
+        return
+
+    if allowed:
+        rate_limit_decisions.inc(policy=policy_name, result="allowed")
+        return
+
+    for key, wait_ms in zip(keys, waits):
+        if wait_ms:
+            blocked_until.set(key, time.monotonic() + wait_ms / 1000, ttl=wait_ms / 1000)
+    rate_limit_decisions.inc(policy=policy_name, result="rejected")
+    raise _too_many_requests(max(waits))
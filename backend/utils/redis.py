@@ -1,21 +1,219 @@
+import hashlib
 import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from collections import defaultdict
+from datetime import datetime
+
+from bson import ObjectId
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from core.config import settings
+from utils.metrics import Collector, Gauge, Histogram
+
+
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round-trip latency by command (pipelines are timed as a whole)",
+)
+
+
+
+
+class InstrumentedPipeline(Pipeline):
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            redis_command_duration.observe(time.perf_counter() - start, command="pipeline")
+
+
+
+
+class InstrumentedRedis(Redis):
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            redis_command_duration.observe(time.perf_counter() - start, command=str(args[0]).lower())
+
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
 
 
-redis = Redis.from_url(settings.REDIS_URL_DOCKER, decode_responses=True)
+
+redis = InstrumentedRedis.from_url(
+    settings.REDIS_URL_DOCKER,
+    decode_responses=True,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+)
+
+redis_pool_in_use = Gauge(
+    "redis_pool_connections_in_use",
+    "Redis connections currently checked out",
+    callback=lambda: len(getattr(redis.connection_pool, "_in_use_connections", ())),
+)
+redis_pool_available = Gauge(
+    "redis_pool_connections_available",
+    "Idle Redis connections kept in the pool",
+    callback=lambda: len(getattr(redis.connection_pool, "_available_connections", ())),
+)
+
+
+cache_stats: dict[str, dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+def _cache_lookup_samples():
+    for name, stats in list(cache_stats.items()):
+        yield (("cache", name), ("result", "hit")), stats["hits"]
+        yield (("cache", name), ("result", "miss")), stats["misses"]
+
+
+def _cache_hit_ratio_samples():
+    for name, stats in list(cache_stats.items()):
+        total = stats["hits"] + stats["misses"]
+        yield (("cache", name),), stats["hits"] / total if total else 0.0
+
+
+cache_lookups = Collector(
+    "cache_lookups_total",
+    "Cache lookups by cache name and result",
+    "counter",
+    _cache_lookup_samples,
+)
+cache_hit_ratio = Collector(
+    "cache_hit_ratio",
+    "Lifetime hit ratio per cache",
+    "gauge",
+    _cache_hit_ratio_samples,
+)
 
 
 async def get_redis() -> Redis:
     return redis
 
 
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def record_cache_lookup(name: str, hit: bool):
+    cache_stats[name]["hits" if hit else "misses"] += 1
+
+
+async def get_from_redis(key):
+    data = await redis.get(key)
+    if data is None:
+        return None
+    return json.loads(data)
+
+
 async def delete_from_redis(key):
-    product = await redis.get(key)
-    if product:
-        await redis.delete(key)
+    await redis.delete(key)
+
+
+async def update_redis(key, data, ttl: int = 300):
+    await redis.setex(key, ttl, json.dumps(data, default=_json_default))
+
+
+
+def product_cache_key(product_id) -> str:
+    return f"product:{str(product_id)}"
+
+
+async def invalidate_product_cache(*product_ids):
+    if product_ids:
+        await redis.delete(*(product_cache_key(pid) for pid in product_ids))
+
+
+
+def _listing_generation_key(category_id) -> str:
+    return f"products:gen:{str(category_id) if category_id else 'all'}"
+
+
+async def bump_product_listing_generation(*category_ids):
+    pipe = redis.pipeline(transaction=False)
+    pipe.incr(_listing_generation_key(None))
+    for category_id in {str(c) for c in category_ids if c}:
+        pipe.incr(_listing_generation_key(category_id))
+    await pipe.execute()
+
+
+async def product_listing_cache_key(filters: dict) -> str:
+    category_id = filters.get("category_id")
+    generation = await redis.get(_listing_generation_key(category_id)) or 0
+    normalized = json.dumps(filters, sort_keys=True, default=_json_default)
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f"products:list:{category_id or 'all'}:{generation}:{digest}"
+
+
+
+async def get_many_from_redis(keys: list[str]) -> dict:
+    if not keys:
+        return {}
+    values = await redis.mget(keys)
+    return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+
+async def update_many_redis(items: dict, ttl: int = 300):
+    if not items:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for key, data in items.items():
+        pipe.setex(key, ttl, json.dumps(data, default=_json_default))
+    await pipe.execute()
+
+
+
+def _stats_generation_key(month: str) -> str:
+    return f"stats:gen:{month}"
+
+
+async def bump_stats_generation(*months):
+    if not months:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for month in set(months):
+        pipe.incr(_stats_generation_key(month))
+    await pipe.execute()
+
+
+async def get_stats_generations(months: list[str]) -> dict[str, int]:
+    if not months:
+        return {}
+    values = await redis.mget([_stats_generation_key(m) for m in months])
+    return {month: int(value or 0) for month, value in zip(months, values)}
+
+
+
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
 
 
-async def update_redis(key, data):
-    await delete_from_redis(key)
-    await redis.setex(key, 300, json.dumps(data))
+@asynccontextmanager
+async def redis_lock(name: str, ttl_ms: int):
+    token = uuid.uuid4().hex
+    acquired = await redis.set(f"lock:{name}", token, nx=True, px=ttl_ms)
+    try:
+        yield bool(acquired)
+    finally:
+        if acquired:
+            await redis.eval(_RELEASE_LOCK, 1, f"lock:{name}", token)
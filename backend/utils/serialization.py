@@ -0,0 +1,111 @@
+import types
+from functools import lru_cache
+from typing import Any, Union, get_args, get_origin
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from core.config import settings
+
+
+
+
+_MISSING = object()
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+
+
+class BSONJSONResponse(JSONResponse):
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+
+
+def _shape_for(annotation):
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return _shape_for(args[0]) if len(args) == 1 else None
+    if origin is list:
+        inner = _shape_for(get_args(annotation)[0])
+        return ("list", inner) if inner is not None else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return ("model", _model_fields(annotation))
+    if annotation is float:
+        return ("float", None)
+    return None
+
+
+@lru_cache(maxsize=None)
+def _model_fields(model: type[BaseModel]) -> tuple:
+    fields = []
+    for name, field in model.model_fields.items():
+        default = _MISSING if field.is_required() else field.get_default(call_default_factory=True)
+        fields.append((field.alias or name, name, _shape_for(field.annotation), default))
+    return tuple(fields)
+
+
+def _shape_value(value, shape):
+    if shape is None or value is None:
+        return value
+    kind, inner = shape
+    if kind == "float":
+        return float(value)
+    if kind == "list":
+        return [_shape_value(v, inner) for v in value]
+    return _shape_doc(value, inner)
+
+
+def _shape_doc(doc: dict, fields: tuple) -> dict:
+    out = {}
+    for alias, name, shape, default in fields:
+        if alias in doc:
+            out[alias] = _shape_value(doc[alias], shape)
+        elif name in doc:
+            out[alias] = _shape_value(doc[name], shape)
+        elif default is not _MISSING:
+            out[alias] = default
+    return out
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def _select(shape, fields: tuple[str, ...]):
+    kind, inner = shape
+    if kind == "list":
+        return (kind, _select(inner, fields))
+    return (kind, tuple(f for f in inner if f[0] in fields))
+
+
+def shape_documents(model, data, fields: tuple[str, ...] | None = None):
+    shape = _shape_for(model)
+    if fields:
+        shape = _select(shape, fields)
+    return _shape_value(data, shape)
+
+
+def fast_response(model, data, status_code: int = 200, fields: tuple[str, ...] | None = None) -> JSONResponse:
+    if settings.FAST_JSON_RESPONSES or fields:
+        return BSONJSONResponse(shape_documents(model, data, fields), status_code=status_code)
+
+    adapter = _type_adapter(model)
+    content = adapter.dump_python(adapter.validate_python(data), mode="json", by_alias=True)
+    return JSONResponse(jsonable_encoder(content), status_code=status_code)
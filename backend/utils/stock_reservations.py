@@ -0,0 +1,242 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from utils.redis import redis
+
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_HOLDS_KEY = "stock:holds:active"
+
+
+# Every script reads the clock from Redis (TIME) so that all workers agree on
+# which holds have expired. Per variant we keep a ZSET of reservation ids
+# scored by expiry, a HASH of reservation id -> held quantity and a counter
+# with the sum of that hash, so available-to-sell is one GET away.
+_SWEEP = """
+local function now_ms()
+    local t = redis.call('TIME')
+    return tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+end
+
+local function sweep(holds, quantities, held, now)
+    local expired = redis.call('ZRANGEBYSCORE', holds, '-inf', now)
+    for _, member in ipairs(expired) do
+        local qty = redis.call('HGET', quantities, member)
+        if qty then
+            redis.call('DECRBY', held, qty)
+            redis.call('HDEL', quantities, member)
+        end
+        redis.call('ZREM', holds, member)
+    end
+    return #expired
+end
+"""
+
+RESERVE_SCRIPT = redis.register_script(_SWEEP + """
+-- KEYS: reservation hash, active index, then (holds, quantities, held) per line
+-- ARGV: reservation id, user id, ttl ms, then (qty, stock, variant id) per line
+local rid = ARGV[1]
+local owner = redis.call('HGET', KEYS[1], 'user')
+if owner and owner ~= ARGV[2] then
+    return {-1, 0}
+end
+
+local now = now_ms()
+local expires_at = now + tonumber(ARGV[3])
+local lines = (#KEYS - 2) / 3
+
+for i = 0, lines - 1 do
+    local k, a = 3 + i * 3, 4 + i * 3
+    sweep(KEYS[k], KEYS[k + 1], KEYS[k + 2], now)
+    local qty, stock = tonumber(ARGV[a]), tonumber(ARGV[a + 1])
+    local mine = tonumber(redis.call('HGET', KEYS[k + 1], rid) or '0')
+    local held = tonumber(redis.call('GET', KEYS[k + 2]) or '0')
+    -- 0 only drops a line this reservation already holds
+    if qty < 0 or (qty == 0 and mine == 0) then
+        return {-2, i + 1}
+    end
+    if qty > mine and held - mine + qty > stock then
+        return {i + 1, 0}
+    end
+end
+
+for i = 0, lines - 1 do
+    local k, a = 3 + i * 3, 4 + i * 3
+    local qty, variant = tonumber(ARGV[a]), ARGV[a + 2]
+    local mine = tonumber(redis.call('HGET', KEYS[k + 1], rid) or '0')
+    if qty > 0 then
+        redis.call('HSET', KEYS[k + 1], rid, qty)
+        redis.call('ZADD', KEYS[k], expires_at, rid)
+        redis.call('HSET', KEYS[1], 'line:' .. variant, qty)
+        redis.call('SADD', KEYS[2], variant)
+    else
+        redis.call('HDEL', KEYS[k + 1], rid)
+        redis.call('ZREM', KEYS[k], rid)
+        redis.call('HDEL', KEYS[1], 'line:' .. variant)
+    end
+    redis.call('INCRBY', KEYS[k + 2], qty - mine)
+end
+
+redis.call('HSET', KEYS[1], 'user', ARGV[2], 'expires_at', expires_at)
+redis.call('PEXPIREAT', KEYS[1], expires_at)
+return {0, expires_at}
+""")
+
+RELEASE_SCRIPT = redis.register_script("""
+-- KEYS: reservation hash, then (holds, quantities, held) per line
+-- ARGV: reservation id
+local rid = ARGV[1]
+for k = 2, #KEYS, 3 do
+    local mine = redis.call('HGET', KEYS[k + 1], rid)
+    if mine then
+        redis.call('DECRBY', KEYS[k + 2], mine)
+        redis.call('HDEL', KEYS[k + 1], rid)
+    end
+    redis.call('ZREM', KEYS[k], rid)
+end
+redis.call('DEL', KEYS[1])
+return 1
+""")
+
+SWEEP_SCRIPT = redis.register_script(_SWEEP + """
+-- KEYS: holds, quantities, held, active index; ARGV: variant id
+local swept = sweep(KEYS[1], KEYS[2], KEYS[3], now_ms())
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[2], KEYS[3])
+    redis.call('SREM', KEYS[4], ARGV[1])
+end
+return swept
+""")
+
+
+
+
+class ReservationConflictError(Exception):
+    def __init__(self, variant: str):
+        self.variant = variant
+        super().__init__(f"Not enough available stock for {variant}")
+
+
+class ReservationOwnerError(Exception):
+    pass
+
+
+class ReservationQuantityError(Exception):
+    def __init__(self, variant: str):
+        self.variant = variant
+        super().__init__(f"Invalid hold quantity for {variant}")
+
+
+
+
+def variant_id(product_id, size: str, color: str) -> str:
+    return f"{str(product_id)}|{size}|{color}"
+
+
+def parse_variant_id(variant: str) -> tuple[str, str, str]:
+    product_id, size, color = variant.split("|", 2)
+    return product_id, size, color
+
+
+def reservation_key(reservation_id: str) -> str:
+    return f"reservation:{reservation_id}"
+
+
+def _variant_keys(variant: str) -> list[str]:
+    return [f"stock:holds:{variant}", f"stock:holdqty:{variant}", f"stock:held:{variant}"]
+
+
+def _from_ms(value) -> datetime:
+    return datetime.utcfromtimestamp(int(value) / 1000)
+
+
+
+
+async def reserve(reservation_id: str, user_id: str, lines: list[tuple[str, int, int]], ttl_seconds: int) -> datetime:
+    keys = [reservation_key(reservation_id), ACTIVE_HOLDS_KEY]
+    args = [reservation_id, user_id, ttl_seconds * 1000]
+    for variant, qty, stock in lines:
+        keys += _variant_keys(variant)
+        args += [qty, stock, variant]
+
+    code, expires_at = await RESERVE_SCRIPT(keys=keys, args=args)
+    if code == -1:
+        raise ReservationOwnerError(reservation_id)
+    if code == -2:
+        raise ReservationQuantityError(lines[expires_at - 1][0])
+    if code > 0:
+        raise ReservationConflictError(lines[code - 1][0])
+    return _from_ms(expires_at)
+
+
+async def get_reservation(reservation_id: str) -> dict | None:
+    data = await redis.hgetall(reservation_key(reservation_id))
+    if not data:
+        return None
+    return {
+        "_id": reservation_id,
+        "user": data.get("user"),
+        "expires_at": _from_ms(data["expires_at"]),
+        "lines": {
+            field.removeprefix("line:"): int(qty)
+            for field, qty in data.items()
+            if field.startswith("line:")
+        },
+    }
+
+
+async def release(reservation_id: str, variants) -> None:
+    keys = [reservation_key(reservation_id)]
+    for variant in variants:
+        keys += _variant_keys(variant)
+    await RELEASE_SCRIPT(keys=keys, args=[reservation_id])
+
+
+async def held_quantities(variants) -> dict[str, int]:
+    variants = list(variants)
+    if not variants:
+        return {}
+    values = await redis.mget([_variant_keys(v)[2] for v in variants])
+    return {v: max(int(value or 0), 0) for v, value in zip(variants, values)}
+
+
+async def active_holds(reservation_id: str, variants) -> dict[str, int]:
+    variants = list(variants)
+    now_seconds, now_micros = await redis.time()
+    now_ms = now_seconds * 1000 + now_micros // 1000
+
+    pipe = redis.pipeline(transaction=False)
+    for variant in variants:
+        holds, quantities, _ = _variant_keys(variant)
+        pipe.zscore(holds, reservation_id)
+        pipe.hget(quantities, reservation_id)
+    results = await pipe.execute()
+
+    active = {}
+    for i, variant in enumerate(variants):
+        expires_at, qty = results[2 * i], results[2 * i + 1]
+        if expires_at is not None and qty is not None and expires_at > now_ms:
+            active[variant] = int(qty)
+    return active
+
+
+async def sweep_expired_holds() -> int:
+    swept = 0
+    for variant in await redis.smembers(ACTIVE_HOLDS_KEY):
+        swept += await SWEEP_SCRIPT(keys=_variant_keys(variant) + [ACTIVE_HOLDS_KEY], args=[variant])
+    return swept
+
+
+async def run_hold_sweeper(interval: float):
+    while True:
+        try:
+            swept = await sweep_expired_holds()
+            if swept:
+                logger.info("released %d expired stock holds", swept)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("stock hold sweep failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,45 @@
+from core.config import settings
+from utils.lru import TTLCache
+from utils.redis import redis, get_many_from_redis, update_redis
+
+
+# Per-worker cache in front of Redis. Invalidation only reaches the local cache
+# of the worker that made the change; other workers may keep serving the old
+# user (e.g. a revoked admin role) for up to USER_CACHE_LOCAL_TTL seconds.
+local_user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_LOCAL_TTL)
+
+
+def user_cache_key(user_id) -> str:
+    return f"user:{str(user_id)}:profile"
+
+
+def _user_generation_key(user_id) -> str:
+    return f"user:{str(user_id)}:gen"
+
+
+# A cached profile stores the generation that was current before it was read
+# from MongoDB, and is only served while that generation is still current. A
+# request that read the user before an update can then still write it back to
+# Redis, but nobody reads it: the update bumped the generation.
+async def get_cached_user(user_id) -> tuple[dict | None, int]:
+    generation_key, key = _user_generation_key(user_id), user_cache_key(user_id)
+    values = await get_many_from_redis([generation_key, key])
+    generation = int(values.get(generation_key, 0))
+    cached = values.get(key)
+    if cached is not None and cached.get("generation") == generation:
+        return cached["user"], generation
+    return None, generation
+
+
+async def cache_user(user_id, user: dict, generation: int):
+    await update_redis(user_cache_key(user_id), {"generation": generation, "user": user}, ttl=settings.USER_CACHE_TTL)
+
+
+async def invalidate_user_cache(user_id):
+    local_user_cache.pop(str(user_id))
+    # The generation outlives any profile written under the previous one.
+    pipe = redis.pipeline(transaction=True)
+    pipe.incr(_user_generation_key(user_id))
+    pipe.expire(_user_generation_key(user_id), settings.USER_CACHE_TTL * 2)
+    pipe.delete(user_cache_key(user_id))
+    await pipe.execute()